@@ -1,17 +1,28 @@
 import streamlit as st
 import asyncio
+import uuid
+from functools import partial
 from config import PAGE_CONFIG
-from utils.pdf_utils import load_pdf, cleanup_temp_files, extract_text_from_pdf, scale_bbox_to_pdf
+from utils.pdf_utils import load_pdf, cleanup_temp_files, get_document_hash, report_page_errors
 from utils.image_utils import extract_page_image
-from utils.text_utils import split_text_into_sections, process_sections_with_ai, format_sections_for_download
+from utils.metrics import count, record_run, span
+from utils.pipeline import run_extraction_pipeline
+from utils.regions import regions_from_canvas
+from utils.register import get_observation_register
+from utils.session_cache import get_memoized, set_memoized
+from utils.text_utils import open_section_job, process_sections_with_ai, section_run_key
 from ui.components import (
-    render_excel_export,
+    render_extraction_result,
     render_prompt_editor,
     render_sidebar,
     render_canvas,
-    render_sections,
+    render_region_template_picker,
+    render_region_template_saver,
     render_download_buttons,
-    render_auth_section
+    render_auth_section,
+    render_metrics_panel,
+    render_register_panel,
+    render_retry_button
 )
 
 # Must be the first Streamlit command
@@ -36,60 +47,81 @@ async def main():
     uploaded_pdf, extract_mode = render_sidebar()
 
     if uploaded_pdf:
+        # Every stage below is timed and shown in the sidebar performance panel
+        with record_run(st.session_state.get('pdf_name')) as run:
+            await process_uploaded_pdf(uploaded_pdf, extract_mode)
+        render_metrics_panel(run)
+    else:
+        # The upload was removed; let the shared store evict the document
+        cleanup_temp_files()
+        st.info("👆 Upload a PDF file to start extracting text.")
+    
+    render_register_panel()
+
+async def process_uploaded_pdf(uploaded_pdf, extract_mode):
+    """Render the page viewer and run extraction for an uploaded PDF."""
+    with span("load_pdf"):
         pdf = load_pdf(uploaded_pdf)
 
-        if pdf:
-            total_pages = len(pdf.pages)
-            page_number = st.sidebar.slider("Select Page", 1, total_pages, 1) - 1
+    if pdf:
+        total_pages = len(pdf.pages)
+        page_number = st.sidebar.slider("Select Page", 1, total_pages, 1) - 1
 
+        with span("extract_page_image"):
             img_pil, canvas_dims, pdf_dims = extract_page_image(pdf, page_number)
+        
+        if img_pil:
+            st.write(f"📃 Page {page_number + 1} of {total_pages}")
             
-            if img_pil:
-                st.write(f"📃 Page {page_number + 1} of {total_pages}")
-                
-                canvas_result = render_canvas(img_pil, canvas_dims, page_number)
+            template_name, template_regions = render_region_template_picker()
+            canvas_result = render_canvas(img_pil, canvas_dims, page_number, template_regions, template_name)
+            
+            # Every box on the canvas is a region; a template's regions keep their saved names
+            objects = canvas_result.json_data["objects"] if canvas_result.json_data else []
+            names = [region.name for region in template_regions or []]
+            regions = regions_from_canvas(objects, canvas_dims, names) if objects else template_regions or []
 
-                if canvas_result.json_data and canvas_result.json_data["objects"]:
-                    last_object = canvas_result.json_data["objects"][-1]
-                    x0, y0 = last_object['left'], last_object['top']
-                    x1, y1 = x0 + last_object['width'], y0 + last_object['height']
-                    
-                    scaled_bbox = scale_bbox_to_pdf((x0, y0, x1, y1), canvas_dims, pdf_dims)
-                    
+            if regions:
+                render_region_template_saver(regions, pdf_dims)
+                scaled_bboxes = [region.to_pdf(*pdf_dims) for region in regions]
+                
+                pages_to_process = [page_number] if extract_mode == "Current Page Only" else range(total_pages)
+                document_hash = get_document_hash(uploaded_pdf)
+                run_key = section_run_key(document_hash, scaled_bboxes, pages_to_process)
+                
+                # Reruns from unrelated widgets reuse the last result for this document, regions, pages and prompt,
+                # including one with failed sections, which are only sent again through the retry button
+                memoized = get_memoized("extraction_results", run_key)
+                if memoized is None:
                     with st.spinner("Extracting text..."):
-                        selected_page = page_number if extract_mode == "Current Page Only" else None
-                        extracted_text = extract_text_from_pdf(pdf, scaled_bbox, selected_page)
-
-                    if extracted_text.strip():
-                        st.success("Text extracted successfully!")
-                        
-                        sections = split_text_into_sections(extracted_text)
-                        
-                        if sections:
-                            # Process sections with AI (now with streaming)
-                            sections_with_data = await process_sections_with_ai(sections)
-                            
-                            render_sections(sections_with_data, page_number)
-                            render_excel_export(sections_with_data, st.session_state.get('pdf_name', 'document'))
-
-                        else:
-                            st.warning("No sections found in the extracted text.")
-                            st.text_area(
-                                "Raw Extracted Text:",
-                                extracted_text,
-                                height=300,
-                                key=f"text_area_{page_number}"
+                        # Results are checkpointed so a dropped session resumes where it stopped
+                        job = open_section_job(run_key)
+                        # Sections are sent to the model while later pages are still being extracted
+                        with span("pipeline"):
+                            result = await run_extraction_pipeline(
+                                pdf, scaled_bboxes, pages_to_process, partial(process_sections_with_ai, job=job)
                             )
-                    else:
-                        st.warning("No text found in the selected area.")
+                    # A fresh id per run keeps exports of an earlier result for the same run key from being served
+                    memoized = set_memoized("extraction_results", run_key, (result, uuid.uuid4().hex))
+                    # Every run feeds the cross-document register; failed sections are skipped there
+                    register = get_observation_register()
+                    if register:
+                        register.add_document(document_hash, st.session_state.get('pdf_name'), result.sections_with_data)
                 else:
-                    st.info("Draw a box around the text you want to extract.")
+                    count("memoized_results")
+                result, result_id = memoized
+                
+                report_page_errors(result.errors)
+                render_retry_button(result, run_key)
+                render_extraction_result(
+                    result, page_number, st.session_state.get('pdf_name', 'document'), (run_key, result_id)
+                )
             else:
-                st.error("Failed to process the selected page.")
+                st.info("Draw one or more boxes around the text you want to extract, or apply a region template.")
         else:
-            st.error("Invalid PDF file. Please try again.")
+            st.error("Failed to process the selected page.")
     else:
-        st.info("👆 Upload a PDF file to start extracting text.")
+        st.error("Invalid PDF file. Please try again.")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,44 @@
+"""Micro-benchmark for JSON recovery over large synthetic model responses.
+
+Run from the repository root:
+    python -m benchmarks.bench_json_recovery
+
+Time per character should stay flat as the response grows; a growing
+ratio means the recovery pass has gone super-linear again.
+"""
+import json
+import random
+import time
+from utils.json_utils import recover_json_objects
+
+def make_response(n_objects, seed=0):
+    """Build a fenced model response with nested objects and braces inside strings."""
+    rng = random.Random(seed)
+    objects = []
+    for i in range(n_objects):
+        objects.append({
+            "Numero_de_observacion": f"{i // 10 + 1}.{i % 10 + 1}",
+            "Descripcion": "Se observa {inconsistencia} en el \"balance\" hídrico " * rng.randint(1, 20),
+            "Informacion_Complementaria": {"anexo": f"Anexo {i}", "paginas": [i, i + 1]},
+            "Literal": rng.choice(["a)", "b)", "c)", None]),
+            "Respuesta": "El titular presenta {respuesta} con llaves } sueltas " * rng.randint(0, 10) or None,
+            "Estado": rng.choice(["Absuelta", "No Absuelta", "Invalidada"])
+        })
+    body = json.dumps(objects, ensure_ascii=False, indent=2)
+    return f"Aquí está el resultado:\n```json\n{body}\n```\n"
+
+def bench(sizes=(100, 1000, 5000, 20000), repeat=3):
+    """Time recover_json_objects for each response size and print ns per character."""
+    print(f"{'objects':>8} {'chars':>12} {'best_s':>10} {'ns/char':>9} {'coverage':>9}")
+    for n in sizes:
+        text = make_response(n)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            report = recover_json_objects(text)
+            best = min(best, time.perf_counter() - start)
+        assert len(report.objects) == n and report.failed == 0
+        print(f"{n:>8} {len(text):>12} {best:>10.4f} {best / len(text) * 1e9:>9.1f} {report.coverage:>9.2%}")
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,128 @@
+"""Benchmark each pipeline stage on synthetic observation reports.
+
+Run from the repository root:
+    python -m benchmarks.run --pages 10 100 1000 --output bench.json
+    python -m benchmarks.run --pages 10 100 --compare bench.json
+
+Stages use the same functions as the app. The AI stage uses the local fake
+backend with zero latency, so it measures our own overhead (streaming,
+parsing, caching off) rather than the model. Results are written as JSON
+so runs from different commits can be compared.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from config import CACHE_CONFIG, PDF_CONFIG
+from utils.ai_utils import structure_sections
+from utils.backends import FakeBackend
+from utils.image_utils import extract_page_image
+from utils.json_utils import recover_json_objects
+from utils.document_store import DocumentStore
+from utils.export_utils import export_sections
+from utils.pdf_utils import extract_text_from_pdf
+from utils.prompts import DEFAULT_PROMPT
+from utils.sections import split_text_into_sections
+from utils.text_utils import generate_excel_file
+from benchmarks.synthetic_pdf import PAGE_HEIGHT, PAGE_WIDTH, build_pdf
+
+# The whole synthetic page, in PDF points
+FULL_PAGE_BBOX = (0, 0, PAGE_WIDTH, PAGE_HEIGHT)
+
+def _timed(results, n_pages, stage, func, *args, items=None):
+    start = time.perf_counter()
+    value = func(*args)
+    seconds = time.perf_counter() - start
+    count = items(value) if items else None
+    results.append({"pages": n_pages, "stage": stage, "seconds": round(seconds, 6), "items": count})
+    print(f"{n_pages:>6}p  {stage:<28} {seconds:>10.4f}s" + (f"  ({count} items)" if count is not None else ""))
+    return value
+
+def bench_document(n_pages, results, store):
+    """Time every stage on one synthetic report of n_pages pages."""
+    data = _timed(results, n_pages, "build_synthetic_pdf", build_pdf, n_pages)
+    # Same path load_pdf takes for a new upload: hash, write to the store, open
+    document = _timed(
+        results, n_pages, "load_pdf",
+        lambda: store.acquire(hashlib.sha256(data).hexdigest(), lambda: data, "bench"),
+        items=lambda d: len(d.pdf.pages)
+    )
+    pdf = document.pdf
+
+    _timed(results, n_pages, "extract_page_image", extract_page_image, pdf, 0)
+    text = _timed(results, n_pages, "extract_text_from_pdf", extract_text_from_pdf, pdf, FULL_PAGE_BBOX,
+                  items=len)
+    _timed(results, n_pages, "extract_text_from_pdf (warm)", extract_text_from_pdf, pdf, FULL_PAGE_BBOX)
+    sections = _timed(results, n_pages, "split_text_into_sections", split_text_into_sections, text, items=len)
+
+    backend = FakeBackend(first_chunk_latency=0, chunk_delay=0, error_rate=0, throttle_rate=0)
+    responses = "\n".join(backend.synthesize(DEFAULT_PROMPT.format(text=section.content)) for section in sections)
+    report = _timed(results, n_pages, "json_recovery", recover_json_objects, responses,
+                    items=lambda r: len(r.objects))
+
+    sections_with_data = _timed(
+        results, n_pages, "structure_sections (fake)",
+        lambda: asyncio.run(structure_sections(backend, sections, DEFAULT_PROMPT)), items=len
+    )
+    _timed(results, n_pages, "generate_excel_file", generate_excel_file, sections_with_data, "bench",
+           items=lambda b: len(b or b""))
+    _timed(results, n_pages, "export_jsonl", export_sections, sections_with_data, "jsonl", items=lambda b: len(b or b""))
+    store.release(document.digest, "bench")
+    return report
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def compare(current, baseline_path, threshold):
+    """Print stages that got slower than the baseline by more than threshold."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["pages"], r["stage"]): r["seconds"] for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for r in current:
+        before = baseline.get((r["pages"], r["stage"]))
+        # Stages this short are dominated by timer noise
+        if not before or max(before, r["seconds"]) < 0.01:
+            continue
+        ratio = r["seconds"] / before
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{r['pages']:>6}p  {r['stage']:<28} {ratio:>6.2f}x{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--output", help="Write the machine-readable report to this JSON file")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    # Skip the on-disk cache so repeated runs keep measuring the structuring path
+    CACHE_CONFIG["enabled"] = False
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = DocumentStore(directory, max_documents=1)
+        for n_pages in args.pages:
+            bench_document(n_pages, results, store)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "extraction_workers": PDF_CONFIG["extraction_workers"],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare, args.threshold)
+
+if __name__ == "__main__":
+    main()
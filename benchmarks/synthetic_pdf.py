@@ -0,0 +1,114 @@
+"""Generate synthetic PDFs shaped like ANA observation reports.
+
+The writer emits plain PDF 1.4 with the built-in Helvetica font, so no
+PDF library is needed. Reports contain numbered "N.N. OBSERVACIÓN" blocks,
+some with literales a), b), c), and responses long enough to run across
+page breaks.
+
+    python -m benchmarks.synthetic_pdf 100 report.pdf
+"""
+import random
+import sys
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 56
+FONT_SIZE = 10
+LINE_HEIGHT = 14
+LINE_CHARS = 90
+
+WORDS = (
+    "el titular debe presentar información sobre la calidad del agua en los puntos de monitoreo "
+    "del río quebrada caudal ecológico vertimiento efluente tratamiento balance hídrico cuenca "
+    "estudio de impacto ambiental autorización uso licencia parámetros ECA anexo plano tabla "
+    "se solicita precisar sustentar actualizar indicar coordenadas UTM de la estación"
+).split()
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _paragraph(rng, min_words, max_words):
+    """Wrap a random paragraph into lines of at most LINE_CHARS characters."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    lines, line = [], ""
+    for word in words:
+        if len(line) + len(word) + 1 > LINE_CHARS:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    lines.append(line)
+    return lines
+
+def report_lines(n_pages, seed=0):
+    """Yield (indent, text) lines for a report that fills n_pages pages."""
+    rng = random.Random(seed)
+    lines_per_page = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+    remaining = n_pages * lines_per_page
+    chapter, number = 1, 0
+    while remaining > 0:
+        number += 1
+        if number > rng.randint(8, 15):
+            chapter, number = chapter + 1, 1
+        block = [(0, f"{chapter}.{number}. OBSERVACIÓN")]
+        block += [(0, line) for line in _paragraph(rng, 20, 80)]
+        if rng.random() < 0.4:
+            for letter in "abcd"[:rng.randint(2, 4)]:
+                text = _paragraph(rng, 10, 40)
+                block.append((12, f"{letter}) {text[0]}"))
+                block += [(24, line) for line in text[1:]]
+        block.append((0, "Respuesta:"))
+        # Some responses are long enough to span several pages
+        block += [(0, line) for line in _paragraph(rng, 30, 900 if rng.random() < 0.1 else 150)]
+        block.append((0, f"Estado: {rng.choice(['Absuelta', 'No Absuelta', 'Invalidada'])}"))
+        block.append((0, ""))
+        for line in block[:remaining]:
+            yield line
+        remaining -= len(block)
+
+def build_pdf(n_pages, seed=0):
+    """Return the bytes of a synthetic report with exactly n_pages pages."""
+    lines_per_page = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+    lines = list(report_lines(n_pages, seed))
+    pages = [lines[i:i + lines_per_page] for i in range(0, n_pages * lines_per_page, lines_per_page)]
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page_number, page_lines in enumerate(pages, 1):
+        ops = [f"BT /F1 {FONT_SIZE} Tf"]
+        y = PAGE_HEIGHT - MARGIN
+        for indent, text in page_lines:
+            ops.append(f"1 0 0 1 {MARGIN + indent} {y} Tm ({_escape(text)}) Tj")
+            y -= LINE_HEIGHT
+        ops.append(f"1 0 0 1 {PAGE_WIDTH // 2} {MARGIN // 2} Tm ({page_number}) Tj ET")
+        stream = "\n".join(ops).encode("cp1252")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+if __name__ == "__main__":
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    path = sys.argv[2] if len(sys.argv) > 2 else f"synthetic_{n_pages}p.pdf"
+    with open(path, "wb") as f:
+        f.write(build_pdf(n_pages))
@@ -0,0 +1,192 @@
+"""Headless batch processing of observation reports, without Streamlit.
+
+Examples:
+    python cli.py "reports/*.pdf" --region 0.05,0.08,0.95,0.95 --output-dir out
+    python cli.py reports/ --template "ANA - Observaciones"
+
+Each document gets <name>.xlsx and <name>.jsonl in the output directory
+(see --formats), plus a summary.json covering the whole batch.
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from config import AI_CONFIG, PDF_CONFIG
+from utils.ai_utils import create_model, structure_sections
+from utils.backends import read_project_id
+from utils.export_utils import EXPORT_FORMATS, available_formats, export_sections
+from utils.job_store import get_job_store, make_job_key
+from utils.metrics import record_run, span
+from utils.pipeline import run_extraction_pipeline
+from utils.prompts import DEFAULT_PROMPT
+from utils.regions import Region, get_region_templates
+from utils.register import get_observation_register
+from utils.text_index import LazyPDF
+
+def parse_box(spec):
+    """Parse an "x0,y0,x1,y1" string into a tuple of floats."""
+    values = tuple(float(v) for v in spec.split(","))
+    if len(values) != 4:
+        raise argparse.ArgumentTypeError(f"expected x0,y0,x1,y1, got {spec!r}")
+    return values
+
+def parse_pages(spec, total_pages):
+    """Turn "all" or a 1-based list like "1-3,7" into zero-based page numbers."""
+    if spec == "all":
+        return list(range(total_pages))
+    page_numbers = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        page_numbers.extend(range(int(first) - 1, min(int(last or first), total_pages)))
+    return page_numbers
+
+def parse_formats(spec):
+    """Parse a comma-separated list of export formats."""
+    formats = [f.strip() for f in spec.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(EXPORT_FORMATS)}")
+    if "parquet" in formats and "parquet" not in available_formats():
+        raise argparse.ArgumentTypeError("parquet export needs the pyarrow package")
+    return formats
+
+def expand_inputs(inputs):
+    """Resolve directories, globs and file paths into a sorted list of PDFs."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(Path(item).glob("*.pdf"))
+        else:
+            paths.update(Path(p) for p in glob.glob(item))
+    return sorted(p for p in paths if p.suffix.lower() == ".pdf")
+
+def resolve_bboxes(args, page):
+    """Return the extraction boxes in PDF points for a page, in reading order."""
+    if args.bbox:
+        return args.bbox
+    if args.template:
+        regions = get_region_templates().get(args.template)
+    else:
+        regions = [Region(f"Region {i}", *box) for i, box in enumerate(args.region, 1)]
+    return [region.to_pdf(page.width, page.height) for region in regions]
+
+def write_outputs(path, observations, output_dir, formats):
+    """Write the requested exports for one document and return the row count."""
+    for export_format in formats:
+        with span(f"export_{export_format}"):
+            data = export_sections(observations, export_format)
+        if data:
+            (output_dir / f"{path.stem}.{EXPORT_FORMATS[export_format][1]}").write_bytes(data)
+    return len(observations)
+
+async def process_document(path, args, model, prompt_template, semaphore):
+    """Run the extraction pipeline on one PDF and return its summary entry."""
+    async with semaphore:
+        start = time.perf_counter()
+        summary = {"document": str(path), "status": "ok"}
+        try:
+            # gather runs each document in its own task, so their metrics stay separate
+            with record_run(str(path)) as run, LazyPDF.open(path) as pdf:
+                page_numbers = parse_pages(args.pages, len(pdf.pages))
+                bboxes = resolve_bboxes(args, pdf.pages[page_numbers[0]] if page_numbers else pdf.pages[0])
+                # Re-running the same batch only sends the sections that have not completed yet
+                document_hash = hashlib.sha256(path.read_bytes()).hexdigest()
+                job = get_job_store().open_job(
+                    make_job_key(document_hash, bboxes, page_numbers, prompt_template), document=str(path)
+                )
+
+                async def process_sections(sections):
+                    return await structure_sections(
+                        model, sections, prompt_template, args.concurrency, job=job, batch_tokens=args.batch_tokens
+                    )
+
+                result = await run_extraction_pipeline(pdf, bboxes, page_numbers, process_sections)
+                rows = write_outputs(path, result.sections_with_data, args.output_dir, args.formats)
+                register = get_observation_register()
+                if register:
+                    register.add_document(document_hash, path.name, result.sections_with_data)
+
+            summary.update(
+                pages=len(page_numbers),
+                sections=len(result.sections),
+                rows=rows,
+                page_errors=[{"page": n + 1, "error": e} for n, e in result.errors],
+                metrics=run.summary()
+            )
+        except Exception as e:
+            summary.update(status="failed", error=str(e))
+        summary["seconds"] = round(time.perf_counter() - start, 3)
+        print(f"[{summary['status']}] {path} ({summary['seconds']}s)", file=sys.stderr)
+        return summary
+
+async def run_batch(args):
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("No PDF files matched the given inputs.", file=sys.stderr)
+        return 1
+
+    if args.template and get_region_templates().get(args.template) is None:
+        print(f"No region template named {args.template!r}.", file=sys.stderr)
+        return 1
+
+    AI_CONFIG["backend"] = args.backend
+    project_id = args.project or read_project_id()
+    if not project_id and args.backend != "fake":
+        print("No project ID: pass --project or set GOOGLE_APPLICATION_CREDENTIALS.", file=sys.stderr)
+        return 1
+    # Every document shares one client, so its ceiling covers --concurrency calls for each of --jobs documents
+    model = create_model(project_id, max_concurrency=args.concurrency * args.jobs)
+
+    prompt_template = Path(args.prompt_file).read_text(encoding="utf-8") if args.prompt_file else DEFAULT_PROMPT
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Share the cores between documents instead of giving every document a full pool
+    PDF_CONFIG["extraction_workers"] = max(1, (os.cpu_count() or 1) // args.jobs)
+
+    semaphore = asyncio.Semaphore(args.jobs)
+    summaries = await asyncio.gather(*(
+        process_document(path, args, model, prompt_template, semaphore) for path in paths
+    ))
+
+    with open(args.output_dir / "summary.json", "w", encoding="utf-8") as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2)
+
+    failed = sum(1 for s in summaries if s["status"] != "ok")
+    print(f"Processed {len(summaries) - failed}/{len(summaries)} documents into {args.output_dir}", file=sys.stderr)
+    return 1 if failed else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Extract and structure observations from PDFs without the UI.")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    region = parser.add_mutually_exclusive_group(required=True)
+    region.add_argument("--bbox", type=parse_box, action="append",
+                        help="Extraction box in PDF points: x0,y0,x1,y1 (repeat for several regions)")
+    region.add_argument("--region", type=parse_box, action="append",
+                        help="Extraction box as page fractions: x0,y0,x1,y1 in 0..1 (repeat for several regions)")
+    region.add_argument("--template", help="Name of a region template saved from the app")
+    parser.add_argument("--pages", default="all", help='Pages to process: "all" or a list like "1-3,7"')
+    parser.add_argument("--prompt-file", help="Prompt template using {text} for the section content")
+    parser.add_argument("--output-dir", type=Path, default=Path("output"))
+    parser.add_argument("--formats", type=parse_formats, default=["xlsx", "jsonl"],
+                        help="Comma-separated exports per document: xlsx, jsonl, parquet (needs pyarrow)")
+    parser.add_argument("--jobs", type=int, default=2, help="Documents processed at the same time")
+    parser.add_argument("--concurrency", type=int, default=AI_CONFIG["max_concurrency"],
+                        help="Model calls in flight per document")
+    parser.add_argument("--batch-tokens", type=int, default=AI_CONFIG["batch_max_tokens"],
+                        help="Estimated section tokens packed into one request (0 sends each section alone)")
+    parser.add_argument("--project", help="Google Cloud project ID (defaults to the credentials file)")
+    parser.add_argument("--backend", choices=["vertex", "fake"], default=AI_CONFIG["backend"],
+                        help="Model backend; fake runs offline with synthetic responses")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return asyncio.run(run_batch(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 """Configuration settings for the PDF Text Extractor."""
+import os
 from typing import Literal
 
 # Page Configuration with proper literal types
@@ -12,12 +13,119 @@ PAGE_CONFIG = {
 PDF_CONFIG = {
     "max_image_width": 800,
     "max_image_height": 1000,
-    "image_resolution": 150
+    # Memory ceiling for rendered page images shared by all sessions
+    "render_cache_mb": 256,
+    # Pages on each side of the current one rendered ahead in the background
+    "prefetch_pages": 1,
+    # Memory budget for each document's page text indices; older pages are rebuilt on demand
+    "index_budget_mb": 64,
+    # Worker processes for "All Pages" extraction (None uses every core)
+    "extraction_workers": None,
+    # Below this many unindexed pages the pool start-up cost is not worth it
+    "parallel_min_pages": 16
+}
+
+# Shared Document Store Configuration
+DOCUMENT_STORE_CONFIG = {
+    "directory": ".cache/documents",
+    # Unreferenced documents are evicted, least recently used first, beyond these limits
+    "max_documents": 20,
+    "max_bytes": 2 * 1024 * 1024 * 1024,
+    # Sessions that have not touched a document for this long no longer hold it
+    "idle_seconds": 3600
+}
+
+# AI Processing Configuration
+AI_CONFIG = {
+    # "vertex" for Gemini, "fake" for the local stand-in used in offline benchmarks
+    "backend": os.environ.get("OBSERVACIONES_BACKEND", "vertex"),
+    # Append every model response to this JSONL file so the fake backend can replay it
+    "record_path": os.environ.get("OBSERVACIONES_RECORD_PATH"),
+    "model_name": "gemini-1.5-pro",
+    "location": "us-central1",
+    "generation_config": {
+        "max_output_tokens": 8192,
+        "temperature": 1,
+        "top_p": 0.95,
+    },
+    # Upper bound on sections sent to the model at the same time
+    "max_concurrency": 4,
+    # Short sections are packed into one request up to this many estimated section tokens (0 disables)
+    "batch_max_tokens": 1500,
+    "batch_max_sections": 8,
+    # Larger sections are split into parts so each structured response fits max_output_tokens (0 disables)
+    "max_section_tokens": 3000,
+    # Sections repeating an earlier one with the same number reuse its result instead of a model call
+    "deduplicate": True,
+    # Estimated word-shingle Jaccard similarity above which two sections count as the same
+    "dedup_threshold": 0.9,
+    # The client shrinks concurrency towards this floor when throttled
+    "min_concurrency": 1,
+    # Token bucket limiting request starts
+    "requests_per_minute": 60,
+    "burst": 10,
+    # Exponential backoff with jitter for 429 and 5xx errors
+    "max_retries": 5,
+    "backoff_base": 1.0,
+    "backoff_max": 30.0
+}
+
+# Local Fake Backend Configuration (seconds, characters and probabilities)
+FAKE_BACKEND_CONFIG = {
+    "replay_path": os.environ.get("OBSERVACIONES_REPLAY_PATH"),
+    "first_chunk_latency": 0.5,
+    "chunk_delay": 0.05,
+    "chunk_size": 120,
+    "error_rate": 0.0,
+    "throttle_rate": 0.0,
+    "seed": 0,
+    # The fake has no real quota, so only injected 429s should slow it down
+    "requests_per_minute": 60000
+}
+
+# AI Result Cache Configuration
+CACHE_CONFIG = {
+    "enabled": os.environ.get("OBSERVACIONES_CACHE", "1") != "0",
+    "path": ".cache/ai_results.sqlite3",
+    "max_bytes": 200 * 1024 * 1024
+}
+
+# Per-session memoization of extraction results and exports
+SESSION_CONFIG = {
+    # Distinct (document, pages, region, prompt) results kept for each browser session
+    "max_results": 8
+}
+
+# Resumable Job Configuration
+JOB_CONFIG = {
+    "path": ".cache/jobs.sqlite3",
+    # Jobs not opened or finished for this many days are dropped with their stored results
+    "retention_days": 7
+}
+
+# Consolidated observation register across documents
+REGISTER_CONFIG = {
+    "enabled": os.environ.get("OBSERVACIONES_REGISTER", "1") != "0",
+    "path": ".cache/register.sqlite3",
+    # Rows shown in the register table; exports always include every matching row
+    "preview_rows": 500
+}
+
+# Saved extraction region templates, stored as page fractions
+REGION_CONFIG = {
+    "templates_path": ".cache/region_templates.json"
+}
+
+# Instrumentation Configuration
+METRICS_CONFIG = {
+    # Append one JSON line per run to this file, e.g. for production cost tracking
+    "export_path": os.environ.get("OBSERVACIONES_METRICS_PATH")
 }
 
 # Regular Expression Pattern
 PATTERNS = {
-    "observation": r"(\d+\.\s*(?:OBSERVACIÓN|Observación).*?)(?=\d+\.\s*(?:OBSERVACIÓN|Observación)|$)"
+    # Header that opens each section; the title group becomes the section title
+    "observation": r"(?P<title>\d+\.+\d+\.)\s*(?:OBSERVACIÓN|Observación)"
 }
 
 # UI Configuration
@@ -0,0 +1,95 @@
+"""Tests for streamed structuring and the merging of partial results."""
+import asyncio
+import json
+import pytest
+from config import CACHE_CONFIG
+from utils.ai_utils import (
+    create_error_response, merge_partial_results, split_oversized_section, structure_batch, structure_section
+)
+from utils.backends import Chunk
+
+PROMPT = "Estructura:\n{text}"
+
+class StubModel:
+    """Model whose stream replays fixed chunks and records every prompt."""
+
+    model_name = "stub"
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.prompts.append(prompt)
+        return [Chunk(text) for text in self.chunks]
+
+class RecordingCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RecordingCache()
+    monkeypatch.setitem(CACHE_CONFIG, "enabled", True)
+    monkeypatch.setattr("utils.ai_utils.get_result_cache", lambda: cache)
+    return cache
+
+def literal(number, letter):
+    return json.dumps({
+        "Numero_de_observacion": number, "Literal": letter, "Descripcion": "d",
+        "Informacion_Complementaria": None, "Respuesta": "r", "Estado": "Absuelta"
+    })
+
+def test_complete_stream_is_cached(cache):
+    model = StubModel(["[", literal("1.1", "a"), ",", literal("1.1", "b"), "]"])
+    result = asyncio.run(structure_section(model, "1.1. Observación", PROMPT))
+    assert [obj["Literal"] for obj in result] == ["a", "b"]
+    assert list(cache.entries.values()) == [result]
+
+def test_truncated_stream_is_an_error_and_not_cached(cache):
+    cut = literal("1.1", "b")[:30]
+    model = StubModel(["[", literal("1.1", "a"), ",", cut])
+    result = asyncio.run(structure_section(model, "1.1. Observación", PROMPT))
+    assert result == create_error_response()
+    assert cache.entries == {}
+
+def test_unparseable_object_is_an_error_and_not_cached(cache):
+    model = StubModel(["[", literal("1.1", "a"), ", {\"Literal\": b}]"])
+    result = asyncio.run(structure_section(model, "1.1. Observación", PROMPT))
+    assert result == create_error_response()
+    assert cache.entries == {}
+
+def test_truncated_batch_falls_back_to_single_requests(cache):
+    model = StubModel(["[", literal("1.1", "a"), ",", literal("1.2", "a")[:20]])
+    batch = [("1.1.", "1.1. Observación"), ("1.2.", "1.2. Observación")]
+    assert asyncio.run(structure_batch(model, batch, PROMPT)) == [None, None]
+    assert cache.entries == {}
+
+def test_merge_keeps_text_contained_in_an_earlier_part():
+    first = {"Numero_de_observacion": "1.1", "Literal": "a", "Descripcion": "Encabezado",
+             "Respuesta": "Ver el anexo 1 y el anexo 2", "Estado": "No Absuelta"}
+    second = {"Numero_de_observacion": "1.1", "Literal": None, "Descripcion": "Encabezado",
+              "Respuesta": "anexo 1", "Estado": "Absuelta"}
+    [record] = merge_partial_results([[first], [second]])
+    assert record["Descripcion"] == "Encabezado"
+    assert record["Respuesta"] == "Ver el anexo 1 y el anexo 2\nanexo 1"
+    assert record["Estado"] == "Absuelta"
+
+def test_merge_fails_the_section_when_a_part_failed():
+    part = {"Numero_de_observacion": "1.1", "Literal": "a", "Respuesta": "r"}
+    assert merge_partial_results([[part], create_error_response()]) == create_error_response()
+
+def test_split_without_line_breaks_keeps_words_and_avoids_tiny_parts():
+    words = " ".join(["palabra"] * 1650)
+    text = "1.1. OBSERVACIÓN\n" + "".join(f"{letter}) {words}\n" for letter in "abcd")
+    parts = split_oversized_section(text, 3000)
+    assert all(len(part) > 1000 for part in parts)
+    for part in parts:
+        body = part.split("\n", 1)[1]
+        assert set(body.replace(")", "").split()) <= {"a", "b", "c", "d", "palabra"}
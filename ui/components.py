@@ -1,10 +1,19 @@
 """UI components for the Streamlit app."""
 import streamlit as st
 from streamlit_drawable_canvas import st_canvas
-from config import CANVAS_CONFIG
+from config import CANVAS_CONFIG, REGISTER_CONFIG
 import json
 from utils.auth_utils import check_credentials, parse_credentials_file, get_credentials_status, clear_credentials
-from utils.text_utils import DEFAULT_PROMPT, generate_excel_file
+from utils.export_utils import EXPORT_COLUMNS, EXPORT_FORMATS, available_formats, export_rows, iter_rows
+from utils.metrics import span
+from utils.records import DEFAULT_ESTADO, ESTADOS
+from utils.regions import get_region_templates, regions_to_canvas
+from utils.register import REGISTER_COLUMNS, get_observation_register
+from utils.session_cache import drop_memoized, get_memoized, set_memoized
+from utils.prompts import DEFAULT_PROMPT
+
+# Fragments rerun on their own when their widgets change; older Streamlit reruns the whole script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
 
 def render_prompt_editor():
     """Render the prompt editor in the sidebar."""
@@ -88,11 +97,11 @@ def render_sidebar():
         
         return uploaded_pdf, extract_mode
 
-def render_canvas(img_pil, canvas_dims, page_number):
-    """Render the drawable canvas."""
+def render_canvas(img_pil, canvas_dims, page_number, initial_regions=None, template_name=None):
+    """Render the drawable canvas, pre-drawn with the regions of a template if one is applied."""
     width, height = canvas_dims
     
-    # Render canvas
+    # Render canvas; applying another template starts a fresh drawing
     canvas_result = st_canvas(
         fill_color=CANVAS_CONFIG["fill_color"],
         stroke_width=CANVAS_CONFIG["stroke_width"],
@@ -100,36 +109,52 @@ def render_canvas(img_pil, canvas_dims, page_number):
         background_image=img_pil,
         drawing_mode="rect",
         update_streamlit=True,
+        initial_drawing=regions_to_canvas(initial_regions, canvas_dims) if initial_regions else None,
         width=width,
         height=height,
-        key=f"canvas_{page_number}",
+        key=f"canvas_{page_number}_{template_name or ''}",
     )
     
-    # Show coordinates if a box is drawn
-    if canvas_result.json_data and canvas_result.json_data["objects"]:
-        last_object = canvas_result.json_data["objects"][-1]
-        
-        # Get coordinates
-        left = int(last_object['left'])
-        top = int(last_object['top'])
-        width = int(last_object['width'])
-        height = int(last_object['height'])
-        
-        # Display coordinates
-        st.sidebar.code(f"""
-        Top-left:     ({left}, {top})
-        Width/Height: {width} x {height}
-        Bottom-right: ({left + width}, {top + height})
-        """)
-    
     return canvas_result
 
-def render_sections(sections, page_number):
-    """Render the extracted sections with structured data."""
+def render_region_template_picker():
+    """Render the template selector in the sidebar and return (name, regions) of the applied template."""
+    templates = get_region_templates()
+    with st.sidebar:
+        st.header("🗺️ Region Templates")
+        name = st.selectbox(
+            "Apply template",
+            [None, *templates.names()],
+            format_func=lambda n: "None (draw regions)" if n is None else n
+        )
+        if name and st.button("🗑️ Delete template"):
+            templates.delete(name)
+            st.rerun()
+    return name, templates.get(name) if name else None
+
+def render_region_template_saver(regions, page_size):
+    """Show the active regions in the sidebar and offer to save them as a template."""
+    with st.sidebar:
+        st.code("\n".join(
+            f"{region.name}: ({region.x0:.3f}, {region.y0:.3f}) → ({region.x1:.3f}, {region.y1:.3f})"
+            for region in regions
+        ))
+        name = st.text_input("Template name", placeholder="e.g. ANA - Observaciones")
+        if st.button("💾 Save regions as template", disabled=not name.strip()):
+            get_region_templates().save(name.strip(), regions, page_size)
+            st.success(f"✅ Template '{name.strip()}' saved")
+        st.divider()
+
+def render_sections(observations, page_number):
+    """Render the extracted sections with their observations."""
     st.subheader("📑 Extracted Sections")
     
-    for title, content, data in sections:
+    for section_id, (source, records) in enumerate(observations.by_section()):
+        title, content = source[0], source[1]
         st.markdown(f"### Section {title}")
+        pages = getattr(source, "pages", None)
+        if pages:
+            st.caption(f"📄 Page {pages}")
         
         # Original content
         st.markdown("#### Original Content")
@@ -137,25 +162,22 @@ def render_sections(sections, page_number):
             label="Raw Text",
             value=content,
             height=200,
-            key=f"section_raw_{title}_{page_number}",
+            key=f"section_raw_{section_id}_{title}_{page_number}",
             disabled=True
         )
         
         # Show structured data
         st.markdown("#### Structured Data")
-        if isinstance(data, list):
-            for idx, json_obj in enumerate(data, 1):
-                st.markdown(f"**Object {idx}**")
-                st.json(json_obj)
-                show_status(json_obj)
-        else:
-            st.json(data)
-            show_status(data)
+        for idx, observation in enumerate(records, 1):
+            st.markdown(f"**Object {idx}**")
+            st.json(observation.to_dict())
+            show_status(observation.estado or DEFAULT_ESTADO)
+            if not observation.estado_valid:
+                st.caption(f"⚠️ Estado {observation.estado!r} is not one of: {', '.join(ESTADOS)}")
         
         st.markdown("---")
 
-def show_status(json_obj):
-    status = json_obj.get("Estado", "No Absuelta")
+def show_status(status):
     status_color = {
         "Absuelta": "#28a745",
         "No Absuelta": "#dc3545",
@@ -181,7 +203,7 @@ def show_status(json_obj):
     )
 
 
-def render_download_buttons(formatted_text, markdown_text, sections):
+def render_download_buttons(formatted_text, markdown_text, observations):
     """Render the download buttons."""
     col1, col2, col3 = st.columns(3)
     
@@ -204,11 +226,12 @@ def render_download_buttons(formatted_text, markdown_text, sections):
     with col3:
         json_data = [
             {
-                "section": title,
-                "content": content,
-                "structured_data": structured_data
+                "section": source[0],
+                "pages": getattr(source, "pages", None),
+                "content": source[1],
+                "structured_data": [observation.to_dict() for observation in records]
             }
-            for title, content, structured_data in sections
+            for source, records in observations.by_section()
         ]
         
         json_str = json.dumps(json_data, indent=2, ensure_ascii=False)
@@ -220,18 +243,140 @@ def render_download_buttons(formatted_text, markdown_text, sections):
             mime="application/json",
         )
 
-def render_excel_export(sections, pdf_name):
-    """Render the section for exporting data to Excel."""
-    excel_bytes = generate_excel_file(sections, pdf_name)
+def render_retry_button(result, run_key):
+    """Offer to send failed sections again; sections already structured are resumed from the job."""
+    if result.complete:
+        return
+    # Outside the result fragment, so the click reruns the whole script and with it the pipeline
+    st.button(
+        "🔁 Retry failed sections",
+        on_click=drop_memoized,
+        args=("extraction_results", run_key),
+        key=f"retry_{run_key}"
+    )
+
+@fragment
+def render_extraction_result(result, page_number, pdf_name, result_key=None):
+    """Render the outcome of an extraction run with its exports."""
+    if not result.text.strip():
+        st.warning("No text found in the selected area.")
+        return
+    
+    st.success("Text extracted successfully!")
+    
+    if result.sections:
+        render_sections(result.sections_with_data, page_number)
+        render_exports(result.sections_with_data, pdf_name, result_key)
+    else:
+        st.warning("No sections found in the extracted text.")
+        st.text_area(
+            "Raw Extracted Text:",
+            result.text,
+            height=300,
+            key=f"text_area_{page_number}"
+        )
+
+def render_exports(observations, pdf_name, result_key=None):
+    """Render the export section; each file is built only when requested."""
+    st.subheader("📊 Export")
+    render_export_buttons(lambda: iter_rows(observations), EXPORT_COLUMNS, f"extracted_sections_{pdf_name}", result_key)
+
+def render_export_buttons(make_rows, columns, file_stem, memo_key=None):
+    """Render a prepare/download button pair per export format for the rows make_rows yields."""
+    formats = available_formats()
     
-    if excel_bytes:
-        st.subheader("📊 Export to Excel")
-        excel_file = f"extracted_sections_{pdf_name}.xlsx"
+    for column, export_format in zip(st.columns(len(formats)), formats):
+        label, extension, mime, _ = EXPORT_FORMATS[export_format]
+        with column:
+            # Files are kept per result set, so reruns and repeated downloads reuse them
+            data = get_memoized("exports", (memo_key, export_format)) if memo_key else None
+            if data is None and st.button(f"⚙️ Prepare {label}", key=f"prepare_{export_format}_{file_stem}_{memo_key}"):
+                with st.spinner(f"Building {label}..."), span(f"export_{export_format}"):
+                    data = export_rows(make_rows(), export_format, columns)
+                if data is None:
+                    st.warning("No data available to export.")
+                    continue
+                if memo_key:
+                    set_memoized("exports", (memo_key, export_format), data)
+            if data is not None:
+                st.download_button(
+                    f"📥 Download {label}",
+                    data,
+                    file_name=f"{file_stem}.{extension}",
+                    mime=mime,
+                    key=f"download_{export_format}_{file_stem}_{memo_key}"
+                )
+
+@fragment
+def render_register_panel():
+    """Render the register of observations from every processed document, with filters and exports."""
+    register = get_observation_register()
+    if register is None:
+        return
+    
+    with st.expander("📚 Observation Register"):
+        documents = register.documents()
+        if not documents:
+            st.info("Observations from processed documents are collected here.")
+            return
+        
+        counts = register.counts_by_estado()
+        metrics = st.columns(len(counts) + 1)
+        metrics[0].metric("Documents", len(documents))
+        for metric, (estado, n) in zip(metrics[1:], counts.items()):
+            metric.metric(estado or "—", n)
+        
+        names = {document_hash: f"{name} ({rows})" for document_hash, name, rows in documents}
+        col1, col2, col3 = st.columns(3)
+        document_hash = col1.selectbox(
+            "Document", [None, *names], format_func=lambda h: "All documents" if h is None else names[h]
+        )
+        estados = col2.multiselect("Estado", [estado for estado in counts if estado])
+        numero = col3.text_input("Observation number", help="A number such as 2.1, or 2 for all of chapter 2").strip()
+        
+        # Filtering and exporting are queries on the register; nothing is sent to the model again
+        total = register.count(numero, estados, document_hash)
+        st.caption(f"{total} matching row(s)")
+        st.dataframe(
+            list(register.query(numero, estados, document_hash, limit=REGISTER_CONFIG["preview_rows"])),
+            use_container_width=True
+        )
+        render_export_buttons(
+            lambda: register.query(numero, estados, document_hash),
+            REGISTER_COLUMNS,
+            "observation_register",
+            (register.version(), numero, tuple(estados), document_hash)
+        )
+
+def render_metrics_panel(run):
+    """Render per-stage timing and resource usage for the last run in the sidebar."""
+    summary = run.summary()
+    with st.sidebar.expander("⏱️ Performance"):
+        col1, col2 = st.columns(2)
+        col1.metric("Wall time", f"{summary['wall_seconds']:.2f} s")
+        if summary["rss_delta_mb"] is not None:
+            col2.metric("RSS change", f"{summary['rss_delta_mb']:+.0f} MB",
+                        help="Resident memory at the end of the run minus at its start")
+        if summary["process_peak_rss_mb"] is not None:
+            st.caption(f"Process peak RSS (all sessions, since start): {summary['process_peak_rss_mb']:.0f} MB")
+        
+        if summary["spans"]:
+            st.markdown("**Stages**")
+            st.table([
+                {"Stage": name, "Calls": s["calls"], "Total (s)": s["total_seconds"], "Max (s)": s["max_seconds"]}
+                for name, s in summary["spans"].items()
+            ])
+        
+        if summary["counters"]:
+            st.markdown("**Counters**")
+            st.table([{"Counter": name, "Value": value} for name, value in summary["counters"].items()])
+        
+        for name, stats in summary["observations"].items():
+            st.caption(f"{name}: mean {stats['mean']:.3f}, p50 {stats['p50']:.3f}, max {stats['max']:.3f} (n={stats['count']})")
+        
         st.download_button(
-            "📥 Download as XLSX",
-            excel_bytes,
-            file_name=excel_file,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "📥 Export metrics (JSONL)",
+            json.dumps(summary, ensure_ascii=False) + "\n",
+            file_name=f"metrics_{st.session_state.get('pdf_name', 'document')}.jsonl",
+            mime="application/jsonl",
         )
-    else:
-        st.warning("No data available to export to Excel.")
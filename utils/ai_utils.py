@@ -0,0 +1,537 @@
+"""Model calls and section structuring, independent of the Streamlit UI."""
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .backends import active_model_name, create_backend
+from .cache_utils import get_result_cache, make_cache_key
+from .dedup import SectionDeduplicator
+from .json_utils import StreamingJSONParser
+from .metrics import count, observe, span
+from .records import ObservationSet, observation_number
+from .vertex_client import ResilientModel
+from config import AI_CONFIG, FAKE_BACKEND_CONFIG
+
+_STREAM_END = object()
+
+_LITERAL_START = re.compile(r"^[ \t]*[a-z]\)", re.MULTILINE)
+_PARAGRAPH_START = re.compile(r"(?<=\n)[ \t]*\n")
+_LINE_START = re.compile(r"(?<=\n)")
+
+# Text fields that are concatenated when one observation is answered in parts
+_MERGED_FIELDS = ("Descripcion", "Informacion_Complementaria", "Respuesta")
+
+class NullPlaceholder:
+    """Stand-in for st.empty() when running without a UI; discards every update."""
+
+    def info(self, *args, **kwargs):
+        pass
+
+    def json(self, *args, **kwargs):
+        pass
+
+    def code(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+# One client per backend and project so rate limits and learned concurrency survive reruns
+_clients = {}
+
+def create_model(project_id=None, max_concurrency=None):
+    """Create the configured backend and return it behind the rate-limited client.
+
+    max_concurrency caps the calls in flight across everyone sharing the
+    client and defaults to AI_CONFIG["max_concurrency"].
+    """
+    max_concurrency = max_concurrency or AI_CONFIG["max_concurrency"]
+    key = (AI_CONFIG["backend"], project_id, max_concurrency)
+    if key not in _clients:
+        rate = FAKE_BACKEND_CONFIG["requests_per_minute"] if AI_CONFIG["backend"] == "fake" else None
+        _clients[key] = ResilientModel(create_backend(project_id), requests_per_minute=rate,
+                                       max_concurrency=max_concurrency)
+    return _clients[key]
+
+def create_error_response():
+    """Create a standard error response wrapped in a list."""
+    return [{
+        "Numero_de_observacion": "Error",
+        "Descripcion": "Error al procesar",
+        "Informacion_Complementaria": None,
+        "Respuesta": None,
+        "Estado": "No Absuelta"
+    }]
+
+def is_error_response(result):
+    """Check whether a result is the placeholder produced by create_error_response."""
+    return result == create_error_response()
+
+def estimate_tokens(text):
+    """Rough token count for budgeting requests, at about four characters per token."""
+    return len(text) // 4 + 1
+
+def _split_to_fit(text, budget):
+    # Coarsest boundary first: literals, then paragraphs, then lines, then raw characters
+    if estimate_tokens(text) <= budget:
+        return [text]
+    for pattern in (_LITERAL_START, _PARAGRAPH_START, _LINE_START):
+        starts = [m.start() for m in pattern.finditer(text) if 0 < m.start() < len(text)]
+        if starts:
+            bounds = [0, *starts, len(text)]
+            return [piece for a, b in zip(bounds, bounds[1:]) for piece in _split_to_fit(text[a:b], budget)]
+    # No line breaks left: cut into even pieces at the last space before each target, so no word is split
+    size = max(1, budget * 4)
+    pieces = []
+    start = 0
+    while len(text) - start > size:
+        remaining = len(text) - start
+        end = start + -(-remaining // -(-remaining // size))
+        cut = max(text.rfind(" ", start + 1, end + 1), text.rfind("\t", start + 1, end + 1))
+        cut = cut if cut > start else end
+        pieces.append(text[start:cut])
+        start = cut
+    pieces.append(text[start:])
+    return pieces
+
+def split_oversized_section(text, max_tokens):
+    """Split a section whose structured output would not fit in one response.
+
+    Parts break at literals (a), b), ...) where possible, otherwise at
+    paragraphs or lines. Every part repeats the header line, and a short
+    preamble before the first literal, so the model keeps the observation
+    number and context.
+    """
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return [text]
+    context, _, body = text.partition("\n")
+    first_literal = _LITERAL_START.search(body)
+    if first_literal and estimate_tokens(body[:first_literal.start()]) <= max_tokens // 4:
+        context = f"{context}\n{body[:first_literal.start()].rstrip()}"
+        body = body[first_literal.start():]
+    budget = max(1, max_tokens - estimate_tokens(context))
+
+    parts = []
+    current = ""
+    for piece in _split_to_fit(body, budget):
+        if current and estimate_tokens(current + piece) > budget:
+            parts.append(current)
+            current = ""
+        current += piece
+    if current:
+        # A small remainder rides along with the previous part instead of costing a request of its own
+        if parts and estimate_tokens(current) <= budget // 10:
+            parts[-1] += current
+        else:
+            parts.append(current)
+    return [f"{context}\n{part.strip()}" for part in parts if part.strip()] or [text]
+
+def merge_partial_results(results):
+    """Combine the results for the parts of one section into its observation records.
+
+    Objects with the same observation number and literal are merged, as are
+    objects without a literal that continue the previous one: text fields are
+    joined in part order, skipping only verbatim repeats, and the last Estado
+    given wins. Any
+    failed part fails the whole section, so no text is silently dropped.
+    """
+    if any(is_error_response(result) for result in results):
+        return create_error_response()
+    merged = {}
+    first = {}
+    last_key = {}
+    for result in results:
+        for obj in result:
+            if not isinstance(obj, dict):
+                continue
+            number = observation_number(obj.get("Numero_de_observacion"))
+            key = (number, obj.get("Literal"))
+            # A part that opens mid-literal comes back without a letter; it continues the previous record
+            if key[1] is None and number in last_key:
+                key = last_key[number]
+            last_key[number] = key
+            record = merged.get(key)
+            if record is None:
+                merged[key] = dict(obj)
+                first[key] = dict(obj)
+                continue
+            for field in _MERGED_FIELDS:
+                value = obj.get(field)
+                # Parts repeat the header, so the first part's description often comes back verbatim
+                if not value or value == record.get(field) or (field == "Descripcion" and value == first[key].get(field)):
+                    continue
+                record[field] = f"{record[field]}\n{value}" if record.get(field) else value
+            if obj.get("Estado"):
+                record["Estado"] = obj["Estado"]
+    return list(merged.values()) or create_error_response()
+
+def demultiplex(objects, titles):
+    """Split a batched response into one object list per section title.
+
+    Objects are matched by observation number. Returns None when an object
+    matches no title or a section gets no object at all.
+    """
+    groups = {observation_number(title): [] for title in titles}
+    if None in groups or len(groups) != len(titles):
+        return None
+    for obj in objects:
+        number = observation_number(obj.get("Numero_de_observacion")) if isinstance(obj, dict) else None
+        if number not in groups:
+            return None
+        groups[number].append(obj)
+    if not all(groups.values()):
+        return None
+    return [groups[observation_number(title)] for title in titles]
+
+def _cache_entry(prompt_template, section_text):
+    cache = get_result_cache()
+    if not cache:
+        return None, None
+    return cache, make_cache_key(prompt_template, section_text, active_model_name(), AI_CONFIG["generation_config"])
+
+async def stream_model_output(model, prompt, executor=None, usage=None):
+    """Run the blocking streaming call in a worker thread and yield its text chunks.
+
+    When a usage dict is given it receives the token counts reported with the
+    stream, once the stream is exhausted. If the consumer stops early, the
+    worker closes the stream at its next chunk instead of reading it to the end.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def put(item):
+        if stopped.is_set():
+            return
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stopped.set()  # The loop is gone, e.g. after an interrupted run
+
+    def produce():
+        response = None
+        try:
+            response = model.generate_content(prompt, generation_config=AI_CONFIG["generation_config"], stream=True)
+            for chunk in response:
+                if stopped.is_set():
+                    break
+                usage_metadata = getattr(chunk, 'usage_metadata', None)
+                if usage is not None and usage_metadata:
+                    usage["tokens_in"] = usage_metadata.prompt_token_count
+                    usage["tokens_out"] = usage_metadata.candidates_token_count
+                if hasattr(chunk, 'text'):
+                    put(chunk.text)
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(response, "close", None)
+            if stopped.is_set() and close is not None:
+                close()
+            put(_STREAM_END)
+
+    loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+async def iterate_in_thread(iterable):
+    """Advance a blocking iterator in a worker thread so the event loop keeps streaming."""
+    iterator = iter(iterable)
+    while True:
+        item = await asyncio.to_thread(next, iterator, _STREAM_END)
+        if item is _STREAM_END:
+            break
+        yield item
+
+async def stream_into_parser(model, prompt, executor=None, on_objects=None):
+    """Stream a prompt's output into a StreamingJSONParser, recording call metrics.
+
+    on_objects receives the parsed objects so far whenever a chunk closes one.
+    """
+    parser = StreamingJSONParser()
+    usage = {}
+    count("model_calls")
+    with span("model_call"):
+        start = time.perf_counter()
+        first_chunk = True
+        async for text in stream_model_output(model, prompt, executor, usage):
+            if first_chunk:
+                observe("time_to_first_chunk_s", time.perf_counter() - start)
+                first_chunk = False
+            if parser.feed(text) and on_objects:
+                on_objects(parser.objects)
+    for name, value in usage.items():
+        count(name, value or 0)
+    return parser
+
+async def structure_section(model, section_text, prompt_template, placeholder=None, executor=None):
+    """Turn one section into a list of observation objects, using the cache when possible."""
+    placeholder = placeholder or NullPlaceholder()
+    try:
+        cache, cache_key = _cache_entry(prompt_template, section_text)
+        cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            count("cache_hits")
+            placeholder.json(cached)
+            return cached
+
+        prompt = prompt_template.format(text=section_text)
+
+        placeholder.info("Processing...")
+
+        # Each chunk is scanned once; the placeholder only changes when an object closes
+        parser = await stream_into_parser(model, prompt, executor, placeholder.json)
+
+        # A cut-off stream or an unparseable object means literals are missing; never cache that
+        if not parser.objects or parser.pending or parser.failed:
+            return create_error_response()
+
+        if cache:
+            cache.set(cache_key, parser.objects)
+        return parser.objects
+
+    except Exception as e:
+        placeholder.error(f"Error: {str(e)}")
+        return create_error_response()
+
+async def structure_batch(model, batch, prompt_template, placeholders=None, executor=None):
+    """Structure several (title, content) sections with a single request.
+
+    Cached sections are answered from the cache and the rest are sent
+    together, with the output split back by observation number. Returns one
+    result per section; an entry is None when that section still needs its
+    own request, because the batch could not be attributed or nothing was
+    left to batch it with.
+    """
+    placeholders = [p or NullPlaceholder() for p in placeholders or [None] * len(batch)]
+    results = [None] * len(batch)
+    pending = []
+    for i, (title, content) in enumerate(batch):
+        cache, cache_key = _cache_entry(prompt_template, content)
+        cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            count("cache_hits")
+            placeholders[i].json(cached)
+            results[i] = cached
+        else:
+            pending.append(i)
+    if len(pending) < 2:
+        return results
+
+    try:
+        prompt = prompt_template.format(text="\n\n".join(batch[i][1] for i in pending))
+        for i in pending:
+            placeholders[i].info(f"Processing together with {len(pending) - 1} other section(s)...")
+
+        count("batched_requests")
+        parser = await stream_into_parser(model, prompt, executor)
+        incomplete = parser.pending or parser.failed
+        grouped = None if incomplete else demultiplex(parser.objects, [batch[i][0] for i in pending])
+    except Exception:
+        grouped = None
+
+    if grouped is None:
+        count("batch_fallbacks")
+        return results
+
+    count("batched_sections", len(pending))
+    for i, objects in zip(pending, grouped):
+        placeholders[i].json(objects)
+        cache, cache_key = _cache_entry(prompt_template, batch[i][1])
+        if cache:
+            cache.set(cache_key, objects)
+        results[i] = objects
+    return results
+
+class SectionBatcher:
+    """Packs consecutive (index, title, content, placeholder) entries into request batches.
+
+    A batch closes when the next section would exceed max_tokens estimated
+    tokens or max_sections, or repeats an observation number already in it.
+    """
+
+    def __init__(self, max_tokens, max_sections):
+        self.max_tokens = max_tokens
+        self.max_sections = max_sections
+        self.batch = []
+        self._used = 0
+        self._numbers = set()
+
+    def add(self, entry):
+        """Queue an entry and return the batch it closed, if any."""
+        _, title, content, _ = entry
+        tokens = estimate_tokens(content)
+        number = observation_number(title)
+        closed = None
+        if self.batch and (self._used + tokens > self.max_tokens
+                           or len(self.batch) >= self.max_sections
+                           or number in self._numbers):
+            closed = self.flush()
+        self.batch.append(entry)
+        self._used += tokens
+        self._numbers.add(number)
+        return closed
+
+    def flush(self):
+        """Return the open batch and start a new one."""
+        batch = self.batch
+        self.batch = []
+        self._used = 0
+        self._numbers = set()
+        return batch
+
+class DuplicateSections:
+    """Sections that repeat an earlier one, answered with its result once that is known."""
+
+    def __init__(self, threshold):
+        self._deduplicator = SectionDeduplicator(threshold)
+        self._titles = {}
+        self._pending = {}
+
+    def add(self, idx, title, content, placeholder=None):
+        """Return True when the section repeats an earlier one and needs no model call."""
+        self._titles[idx] = title
+        match = self._deduplicator.add(idx, content, observation_number(title))
+        if match is None:
+            return False
+        original, kind = match
+        self._pending[idx] = (original, placeholder)
+        count(f"duplicate_sections_{kind}")
+        if placeholder:
+            placeholder.info(f"Same as section {self._titles[original]}; reusing its result.")
+        return True
+
+    def fill(self, by_index):
+        """Copy each original's result to its duplicates in the index-to-result mapping."""
+        for idx, (original, placeholder) in self._pending.items():
+            by_index[idx] = by_index[original]
+            if placeholder:
+                placeholder.json(by_index[original])
+
+async def structure_in_parts(structure_part, content, placeholder=None):
+    """Structure one section, sending it in parts and merging them when it is oversized."""
+    parts = split_oversized_section(content, AI_CONFIG["max_section_tokens"])
+    if len(parts) == 1:
+        return await structure_part(content, placeholder)
+    count("split_sections")
+    count("section_parts", len(parts))
+    if placeholder:
+        placeholder.info(f"Processing in {len(parts)} parts...")
+    result = merge_partial_results(await asyncio.gather(*(structure_part(part) for part in parts)))
+    if placeholder:
+        placeholder.json(result)
+    return result
+
+async def structure_queued(batch, structure_part, structure_together, job=None):
+    """Structure a batch from SectionBatcher and return (index, result) pairs.
+
+    Results already checkpointed in the job are reused; the rest go out in one
+    request when there are several, and sections the batch could not answer
+    are sent on their own. New results are checkpointed in the job.
+    """
+    results = {}
+    pending = []
+    for idx, title, content, placeholder in batch:
+        result = job.start_task(idx, title, content) if job else None
+        if result is not None:
+            if placeholder:
+                placeholder.json(result)
+            results[idx] = result
+        else:
+            pending.append((idx, title, content, placeholder))
+
+    batched = await structure_together(pending) if len(pending) > 1 else [None] * len(pending)
+    singles = [section for section, result in zip(pending, batched) if result is None]
+    single_results = await asyncio.gather(*(
+        structure_in_parts(structure_part, content, placeholder) for _, _, content, placeholder in singles
+    ))
+
+    fresh = {idx: result for (idx, *_), result in zip(pending, batched) if result is not None}
+    fresh.update((idx, result) for (idx, *_), result in zip(singles, single_results))
+    for idx, result in fresh.items():
+        if job:
+            job.finish_task(idx, result, failed=is_error_response(result))
+        results[idx] = result
+    return [(idx, results[idx]) for idx, *_ in batch]
+
+async def structure_sections(model, sections, prompt_template, max_concurrency=None,
+                             on_section=None, on_progress=None, job=None, batch_tokens=None, deduplicate=None):
+    """Structure a possibly lazy iterable of (title, content, ...) sections into an ObservationSet.
+
+    At most max_concurrency model calls are in flight. on_section receives each
+    title and may return a placeholder; on_progress receives the completed
+    fraction; a job checkpoints results and resumes those of an earlier run.
+    """
+    max_concurrency = max_concurrency or AI_CONFIG["max_concurrency"]
+    batch_tokens = AI_CONFIG["batch_max_tokens"] if batch_tokens is None else batch_tokens
+    deduplicate = AI_CONFIG["deduplicate"] if deduplicate is None else deduplicate
+    batcher = SectionBatcher(batch_tokens, AI_CONFIG["batch_max_sections"])
+    duplicates = DuplicateSections(AI_CONFIG["dedup_threshold"]) if deduplicate else None
+    semaphore = asyncio.Semaphore(max_concurrency)
+    completed = 0
+    discovered = []
+    tasks = []
+
+    # Not a with block: an interrupted run (e.g. a Streamlit rerun) must not wait for streams in flight
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        async def structure_part(content, placeholder=None):
+            async with semaphore:
+                return await structure_section(model, content, prompt_template, placeholder, executor)
+
+        async def structure_together(pending):
+            async with semaphore:
+                return await structure_batch(
+                    model, [(title, content) for _, title, content, _ in pending], prompt_template,
+                    [placeholder for *_, placeholder in pending], executor
+                )
+
+        async def run(batch):
+            nonlocal completed
+            results = await structure_queued(batch, structure_part, structure_together, job)
+            completed += len(batch)
+            if on_progress:
+                on_progress(completed / len(discovered))
+            return results
+
+        # Sections are registered as they arrive, so callers see them in section order
+        async for section in iterate_in_thread(sections):
+            idx = len(discovered)
+            title, content = section[0], section[1]
+            placeholder = on_section(title) if on_section else None
+            discovered.append(section)
+            # Repeated sections wait for the first occurrence instead of calling the model
+            if duplicates is not None and duplicates.add(idx, title, content, placeholder):
+                completed += 1
+                continue
+            closed = batcher.add((idx, title, content, placeholder))
+            if closed:
+                tasks.append(asyncio.create_task(run(closed)))
+        if batcher.batch:
+            tasks.append(asyncio.create_task(run(batcher.flush())))
+
+        by_index = dict(pair for batch_results in await asyncio.gather(*tasks) for pair in batch_results)
+        if duplicates is not None:
+            duplicates.fill(by_index)
+        results = [by_index[idx] for idx in range(len(discovered))]
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if job:
+        job.finish()
+
+    observations = ObservationSet()
+    for section, result in zip(discovered, results):
+        observations.add(section, result, failed=is_error_response(result))
+
+    return observations
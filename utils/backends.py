@@ -0,0 +1,187 @@
+"""Model backends: Vertex AI and a deterministic local stand-in for offline runs.
+
+Every backend exposes the GenerativeModel call shape used by the rest of the
+app, generate_content(prompt, generation_config=None, stream=False), where a
+stream yields chunks with a `text` attribute, plus a `model_name` used in
+cache and job keys.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import NamedTuple
+from config import AI_CONFIG, FAKE_BACKEND_CONFIG
+
+class UsageMetadata(NamedTuple):
+    prompt_token_count: int
+    candidates_token_count: int
+
+class Chunk(NamedTuple):
+    text: str
+    usage_metadata: UsageMetadata = None
+
+class ModelBackend:
+    """Interface implemented by every model backend."""
+
+    model_name = None
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        raise NotImplementedError
+
+class VertexBackend(ModelBackend):
+    """Gemini on Vertex AI."""
+
+    def __init__(self, project_id, location=None, model_name=None):
+        # Imported here so offline runs with the fake backend do not need the SDK
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
+
+        self.model_name = model_name or AI_CONFIG["model_name"]
+        vertexai.init(project=project_id, location=location or AI_CONFIG["location"])
+        self._model = GenerativeModel(self.model_name)
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        return self._model.generate_content(prompt, generation_config=generation_config, stream=stream)
+
+def read_project_id(credentials_path=None):
+    """Read the project ID from a service account key file."""
+    credentials_path = credentials_path or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if not credentials_path or not os.path.exists(credentials_path):
+        return None
+    with open(credentials_path) as f:
+        return json.load(f).get("project_id")
+
+class FakeBackendError(Exception):
+    """Injected failure carrying an HTTP status like google.api_core errors do."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+_HEADER = re.compile(r'(\d+\.+\d+)\.\s*(?:OBSERVACIÓN|Observación)')
+_LITERAL = re.compile(r'^\s*([a-z])\)', re.MULTILINE)
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+class FakeBackend(ModelBackend):
+    """Local backend with configurable latency, chunking and error rates.
+
+    Responses are replayed from a JSONL recording when the prompt was seen
+    before, otherwise synthesized as schema-valid observation JSON derived
+    from the section headers and literals in the prompt. Output depends only
+    on the prompt; injected errors come from a seeded generator.
+    """
+
+    model_name = "fake"
+
+    def __init__(self, replay_path=None, first_chunk_latency=None, chunk_delay=None, chunk_size=None,
+                 error_rate=None, throttle_rate=None, seed=None):
+        config = FAKE_BACKEND_CONFIG
+        self.first_chunk_latency = config["first_chunk_latency"] if first_chunk_latency is None else first_chunk_latency
+        self.chunk_delay = config["chunk_delay"] if chunk_delay is None else chunk_delay
+        self.chunk_size = chunk_size or config["chunk_size"]
+        self.error_rate = config["error_rate"] if error_rate is None else error_rate
+        self.throttle_rate = config["throttle_rate"] if throttle_rate is None else throttle_rate
+        self._random = random.Random(config["seed"] if seed is None else seed)
+        self._lock = threading.Lock()
+        self._recorded = {}
+        replay_path = replay_path or config["replay_path"]
+        if replay_path:
+            with open(replay_path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._recorded[entry["prompt_hash"]] = entry["response"]
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            raise FakeBackendError("429 Resource exhausted (injected)", 429)
+        if roll < self.throttle_rate + self.error_rate:
+            raise FakeBackendError("503 Service unavailable (injected)", 503)
+
+        text = self._recorded.get(prompt_hash(prompt)) or self.synthesize(prompt)
+        # Rough 4-characters-per-token estimate, reported on the last chunk like Gemini does
+        usage = UsageMetadata(len(prompt) // 4, len(text) // 4)
+        chunks = self._stream(text, usage)
+        return chunks if stream else Chunk("".join(c.text for c in chunks), usage)
+
+    def _stream(self, text, usage):
+        time.sleep(self.first_chunk_latency)
+        for start in range(0, len(text), self.chunk_size):
+            if start:
+                time.sleep(self.chunk_delay)
+            end = start + self.chunk_size
+            yield Chunk(text[start:end], usage if end >= len(text) else None)
+
+    def synthesize(self, prompt):
+        """Build a plausible response with one object per observation or literal."""
+        rng = random.Random(prompt_hash(prompt))
+        headers = list(_HEADER.finditer(prompt))
+        objects = []
+        for i, header in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(prompt)
+            body = prompt[header.end():end]
+            literals = list(dict.fromkeys(_LITERAL.findall(body)))
+            # The header line stands in for the description; the rest of the prompt is instructions
+            description = body.split("\n", 1)[0].strip() or None
+            for literal in literals or [None]:
+                obj = {
+                    "Numero_de_observacion": header.group(1),
+                    "Descripcion": description,
+                    "Informacion_Complementaria": None,
+                    "Respuesta": rng.choice([None, "Se adjunta la información solicitada."]),
+                    "Estado": rng.choice(["Absuelta", "No Absuelta", "Invalidada"])
+                }
+                if literal:
+                    obj["Literal"] = literal
+                objects.append(obj)
+        body = json.dumps(objects[0] if len(objects) == 1 else objects, ensure_ascii=False, indent=4)
+        return f"```json\n{body}\n```"
+
+class RecordingBackend(ModelBackend):
+    """Pass calls through to another backend and append each full response to a JSONL file."""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.path = path
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        if not stream:
+            response = self.backend.generate_content(prompt, generation_config=generation_config)
+            self._record(prompt, response.text)
+            return response
+        return self._stream(prompt, generation_config)
+
+    def _stream(self, prompt, generation_config):
+        parts = []
+        for chunk in self.backend.generate_content(prompt, generation_config=generation_config, stream=True):
+            if hasattr(chunk, "text"):
+                parts.append(chunk.text)
+            yield chunk
+        self._record(prompt, "".join(parts))
+
+    def _record(self, prompt, response):
+        line = json.dumps({"prompt_hash": prompt_hash(prompt), "response": response}, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+def active_model_name():
+    """Model name of the configured backend, used to keep cached results apart."""
+    return FakeBackend.model_name if AI_CONFIG["backend"] == "fake" else AI_CONFIG["model_name"]
+
+def create_backend(project_id=None):
+    """Create the backend selected by AI_CONFIG['backend']."""
+    if AI_CONFIG["backend"] == "fake":
+        backend = FakeBackend()
+    else:
+        backend = VertexBackend(project_id)
+    if AI_CONFIG["record_path"]:
+        backend = RecordingBackend(backend, AI_CONFIG["record_path"])
+    return backend
@@ -0,0 +1,89 @@
+"""Persistent cache for AI structuring results."""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from config import CACHE_CONFIG
+
+def make_cache_key(prompt_template, section_text, model_name, generation_config):
+    """Hash every input that determines the model output for a section."""
+    payload = json.dumps(
+        [prompt_template, section_text, model_name, generation_config],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """SQLite-backed key/value store with size-based LRU eviction."""
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = Path(path or CACHE_CONFIG["path"])
+        self.max_bytes = max_bytes or CACHE_CONFIG["max_bytes"]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a JSON-serializable value and evict old entries if over budget."""
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the store fits in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+_result_cache = None
+
+def get_result_cache():
+    """Return the process-wide result cache, or None when caching is disabled."""
+    global _result_cache
+    if not CACHE_CONFIG["enabled"]:
+        return None
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
@@ -0,0 +1,87 @@
+"""Exact and near-duplicate detection for sections, so repeated text is sent to the model once."""
+import hashlib
+import re
+import zlib
+
+# MinHash signature length and LSH banding (NUM_PERM = BANDS * ROWS)
+NUM_PERM = 64
+BANDS = 16
+ROWS = 4
+SHINGLE_WORDS = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"\w+")
+
+def _permutations():
+    # Fixed coefficients keep signatures stable across processes and runs
+    seed = hashlib.sha256(b"observaciones-minhash").digest()
+    coefficients = []
+    for i in range(NUM_PERM):
+        block = hashlib.sha256(seed + i.to_bytes(2, "big")).digest()
+        a = int.from_bytes(block[:8], "big") % (_MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(block[8:16], "big") % _MERSENNE_PRIME
+        coefficients.append((a, b))
+    return coefficients
+
+_PERMUTATIONS = _permutations()
+
+def normalize_words(text):
+    """Casefolded words of a text, ignoring punctuation, line breaks and spacing from extraction."""
+    return _WORD.findall(text.casefold())
+
+def shingles(words, size=SHINGLE_WORDS):
+    """Hashed word n-grams; texts shorter than size form a single shingle."""
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+def minhash(shingle_hashes):
+    """MinHash signature of a shingle set."""
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in shingle_hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+class SectionDeduplicator:
+    """Remembers the sections seen so far and matches new ones against them.
+
+    Only sections in the same group (the observation number) are compared,
+    so a result fanned out to a duplicate always carries the right number.
+    Exact matches are found by hashing the normalized words; near matches by
+    MinHash signatures bucketed with locality-sensitive hashing, then checked
+    against the similarity threshold.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self._exact = {}
+        self._signatures = {}
+        self._buckets = {}
+
+    def add(self, key, text, group=None):
+        """Return (key of the earlier equivalent section, kind) or register this one and return None.
+
+        kind is "exact" or "near".
+        """
+        words = normalize_words(text)
+        digest = hashlib.sha256(f"{group}\0{' '.join(words)}".encode("utf-8")).hexdigest()
+        if digest in self._exact:
+            return self._exact[digest], "exact"
+
+        signature = minhash(shingles(words))
+        bands = [(group, band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+        candidates = {candidate for band in bands for candidate in self._buckets.get(band, ())}
+        # The earliest matching section wins, so results follow document order
+        for candidate in sorted(candidates):
+            if similarity(signature, self._signatures[candidate]) >= self.threshold:
+                return candidate, "near"
+
+        self._exact[digest] = key
+        self._signatures[key] = signature
+        for band in bands:
+            self._buckets.setdefault(band, []).append(key)
+        return None
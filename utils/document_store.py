@@ -0,0 +1,132 @@
+"""Cross-session store of uploaded PDFs keyed by the SHA-256 of their bytes."""
+import os
+import threading
+import time
+from pathlib import Path
+from config import DOCUMENT_STORE_CONFIG
+from .text_index import LazyPDF, register_document_hash
+
+class StoredDocument:
+    """One on-disk copy and one pdfplumber handle shared by every session using it."""
+
+    def __init__(self, digest, path, pdf):
+        self.digest = digest
+        self.path = path
+        self.pdf = pdf
+        self.size = os.path.getsize(path)
+        self.sessions = set()
+        self.last_used = time.time()
+
+class DocumentStore:
+    """Reference-counted document cache with bounded disk and handle usage.
+
+    Page indices and renders are keyed by the handle or the digest, and AI
+    results by content, so sessions sharing a document share those too.
+    Sessions never say goodbye in Streamlit, so references older than
+    idle_seconds are treated as released.
+    """
+
+    def __init__(self, directory=None, max_documents=None, max_bytes=None, idle_seconds=None):
+        config = DOCUMENT_STORE_CONFIG
+        self.directory = Path(directory or config["directory"])
+        self.max_documents = max_documents or config["max_documents"]
+        self.max_bytes = max_bytes or config["max_bytes"]
+        self.idle_seconds = idle_seconds or config["idle_seconds"]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._documents = {}
+        # Per-digest locks for documents being written and opened outside the registry lock
+        self._opening = {}
+        self._lock = threading.Lock()
+        self._remove_orphans()
+
+    def _remove_orphans(self):
+        # Copies left behind by a previous server process that nobody has touched recently
+        cutoff = time.time() - self.idle_seconds
+        for path in self.directory.glob("*.pdf"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+
+    def acquire(self, digest, get_bytes, session_id):
+        """Return the shared document for digest, writing it to disk on first use."""
+        with self._lock:
+            document = self._documents.get(digest)
+            if document is not None:
+                return self._use(document, session_id)
+            opening = self._opening.setdefault(digest, threading.Lock())
+
+        # Only sessions asking for this digest wait while it is written and opened
+        with opening:
+            with self._lock:
+                document = self._documents.get(digest)
+                if document is not None:
+                    return self._use(document, session_id)
+            try:
+                document = self._open(digest, get_bytes)
+            finally:
+                with self._lock:
+                    self._opening.pop(digest, None)
+            with self._lock:
+                self._documents[digest] = document
+                return self._use(document, session_id)
+
+    def _open(self, digest, get_bytes):
+        path = self.directory / f"{digest}.pdf"
+        if not path.exists():
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(get_bytes())
+            tmp_path.replace(path)
+        path.touch()
+        # Pages are created on first use, under the page list's own lock
+        pdf = LazyPDF.open(path)
+        register_document_hash(pdf, digest)
+        return StoredDocument(digest, str(path), pdf)
+
+    def _use(self, document, session_id):
+        document.sessions.add(session_id)
+        document.last_used = time.time()
+        self._evict()
+        return document
+
+    def release(self, digest, session_id):
+        """Drop a session's reference; unreferenced documents become evictable."""
+        with self._lock:
+            document = self._documents.get(digest)
+            if document is not None:
+                document.sessions.discard(session_id)
+                self._evict()
+
+    def _evict(self):
+        now = time.time()
+        for document in self._documents.values():
+            if now - document.last_used > self.idle_seconds:
+                document.sessions.clear()
+
+        idle = sorted(
+            (d for d in self._documents.values() if not d.sessions),
+            key=lambda d: d.last_used
+        )
+        total = sum(d.size for d in self._documents.values())
+        for document in idle:
+            if len(self._documents) <= self.max_documents and total <= self.max_bytes:
+                break
+            del self._documents[document.digest]
+            total -= document.size
+            document.pdf.close()
+            Path(document.path).unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "bytes": sum(d.size for d in self._documents.values()),
+                "sessions": sum(len(d.sessions) for d in self._documents.values())
+            }
+
+_document_store = None
+
+def get_document_store():
+    """Return the process-wide document store, creating it on first use."""
+    global _document_store
+    if _document_store is None:
+        _document_store = DocumentStore()
+    return _document_store
@@ -0,0 +1,98 @@
+"""Export observation records or register rows as XLSX, JSONL or Parquet without building a DataFrame."""
+import importlib.util
+import io
+import json
+
+# Column order shared by every export format
+EXPORT_COLUMNS = [
+    "Numero_de_observacion",
+    "Descripcion",
+    "Informacion_Complementaria",
+    "Literal",
+    "Respuesta",
+    "Estado",
+    "Paginas"
+]
+
+def iter_rows(observations):
+    """Yield one export row per observation of an ObservationSet, in section order."""
+    return observations.rows() if observations else iter(())
+
+def _cell(value):
+    # Models occasionally return nested values; write-only sheets only take scalars
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+def export_xlsx(rows, columns=EXPORT_COLUMNS):
+    """Write rows with a write-only workbook; returns None when there are none.
+
+    Rows are streamed into the sheet as they are produced instead of being
+    held in a DataFrame and an in-memory cell model first.
+    """
+    from openpyxl import Workbook
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    sheet.append([_cell(first.get(column)) for column in columns])
+    for row in rows:
+        sheet.append([_cell(row.get(column)) for column in columns])
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def export_jsonl(rows, columns=EXPORT_COLUMNS):
+    """One JSON object per row, for loading into analytics tools line by line."""
+    lines = [json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False) + "\n" for row in rows]
+    return "".join(lines).encode("utf-8") if lines else None
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+def export_parquet(rows, columns=EXPORT_COLUMNS):
+    """Columnar Parquet file; requires the optional pyarrow package."""
+    data = {column: [] for column in columns}
+    for row in rows:
+        for column in columns:
+            data[column].append(_cell(row.get(column)))
+    return write_parquet(data)
+
+def write_parquet(data):
+    """Write a dict of equally long column lists as Parquet, or None when they are empty."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not next(iter(data.values()), None):
+        return None
+    buffer = io.BytesIO()
+    pq.write_table(pa.table(data), buffer)
+    return buffer.getvalue()
+
+# Label, file extension, MIME type and writer for every export format
+EXPORT_FORMATS = {
+    "xlsx": ("XLSX", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", export_xlsx),
+    "jsonl": ("JSONL", "jsonl", "application/jsonl", export_jsonl),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet", export_parquet)
+}
+
+def available_formats():
+    """Export formats whose dependencies are installed."""
+    return [name for name in EXPORT_FORMATS if name != "parquet" or parquet_available()]
+
+def export_rows(rows, export_format, columns=EXPORT_COLUMNS):
+    """Serialize row dicts in one of EXPORT_FORMATS, or None when there are no rows."""
+    return EXPORT_FORMATS[export_format][3](rows, columns)
+
+def export_sections(observations, export_format):
+    """Serialize an ObservationSet in one of EXPORT_FORMATS, or None when there is nothing to export."""
+    if export_format == "parquet" and observations:
+        # Records already hold validated scalars, so columns go straight to the writer
+        return write_parquet(observations.columns())
+    return export_rows(iter_rows(observations), export_format)
@@ -1,24 +1,123 @@
 """Image processing utilities."""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from PIL import Image
 from config import PDF_CONFIG
+from .text_index import LazyPDF, document_hash, get_pdf_path, open_page, release_page
+
+class RenderCache:
+    """LRU cache of rendered page images, bounded by their decoded size in memory."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        size = image.width * image.height * len(image.getbands())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = image
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.width * evicted.height * len(evicted.getbands())
+
+_render_cache = RenderCache(PDF_CONFIG["render_cache_mb"] * 1024 * 1024)
+
+# PDFium is not thread-safe even across documents, so every rasterization in the process is serialized
+_render_lock = threading.Lock()
+
+def canvas_size(page_width, page_height):
+    """Return the canvas size for a page and the PDF-points-to-pixels scale."""
+    scale = min(
+        PDF_CONFIG["max_image_width"] / page_width,
+        PDF_CONFIG["max_image_height"] / page_height
+    )
+    return int(page_width * scale), int(page_height * scale), scale
+
+def render_page(page):
+    """Render a page directly at canvas size instead of rendering large and downscaling."""
+    width, height, scale = canvas_size(page.width, page.height)
+    with _render_lock:
+        img_pil = page.to_image(resolution=72 * scale).original
+    if img_pil.size != (width, height):
+        # Rasterizing rounds up to whole pixels; trim the difference
+        img_pil = img_pil.resize((width, height), Image.Resampling.LANCZOS)
+    return img_pil
+
+def _render_key(pdf, page_number):
+    return (document_hash(pdf), page_number, PDF_CONFIG["max_image_width"], PDF_CONFIG["max_image_height"])
+
+# Prefetching uses its own pdfplumber handles, so it never shares a file stream with the script thread;
+# the rendering itself still goes through _render_lock
+_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch")
+_prefetch_handles = OrderedDict()
+_prefetch_pending = set()
+_prefetch_lock = threading.Lock()
+
+def _prefetch_page(pdf_path, page_number, key):
+    try:
+        handle = _prefetch_handles.get(pdf_path)
+        if handle is None:
+            handle = _prefetch_handles[pdf_path] = LazyPDF.open(pdf_path)
+            if len(_prefetch_handles) > 2:
+                _prefetch_handles.popitem(last=False)[1].close()
+        page = handle.pages[page_number]
+        _render_cache.put(key, render_page(page))
+        release_page(page)
+    except Exception:
+        pass  # Prefetching is best effort; the page is rendered on demand instead
+    finally:
+        with _prefetch_lock:
+            _prefetch_pending.discard(key)
+
+def prefetch_neighbours(pdf, page_number):
+    """Render the pages around page_number in the background."""
+    pdf_path = get_pdf_path(pdf)
+    if pdf_path is None:
+        return
+    distance = PDF_CONFIG["prefetch_pages"]
+    for neighbour in range(page_number - distance, page_number + distance + 1):
+        if neighbour == page_number or not 0 <= neighbour < len(pdf.pages):
+            continue
+        key = _render_key(pdf, neighbour)
+        with _prefetch_lock:
+            if key in _prefetch_pending or key in _render_cache:
+                continue
+            _prefetch_pending.add(key)
+        _prefetch_executor.submit(_prefetch_page, pdf_path, neighbour, key)
 
 def extract_page_image(pdf, page_number):
     """Extract and resize the image of a specific page from a PDF."""
     try:
         page = pdf.pages[page_number]
-        image = page.to_image(resolution=PDF_CONFIG["image_resolution"])
-        img_pil = image.original
-
-        scale_factor = min(
-            PDF_CONFIG["max_image_width"] / img_pil.width,
-            PDF_CONFIG["max_image_height"] / img_pil.height
-        )
-        new_width = int(img_pil.width * scale_factor)
-        new_height = int(img_pil.height * scale_factor)
+        key = _render_key(pdf, page_number)
+        img_resized = _render_cache.get(key)
+        if img_resized is None:
+            with open_page(pdf, page_number) as page:
+                img_resized = render_page(page)
+            _render_cache.put(key, img_resized)
         
-        img_resized = img_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        return img_resized, (new_width, new_height), (page.width, page.height)
+        prefetch_neighbours(pdf, page_number)
+        return img_resized, img_resized.size, (page.width, page.height)
     except Exception as e:
         st.error(f"Error processing page image: {str(e)}")
-        return None, None, None
\ No newline at end of file
+        return None, None, None
@@ -0,0 +1,144 @@
+"""Persistent jobs so interrupted runs resume without repeating model calls."""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from config import JOB_CONFIG
+from .backends import active_model_name
+from .text_index import as_bboxes
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+def make_job_key(document_hash, bbox, page_numbers, prompt_template):
+    """Identify a run by its document, extraction region(s), pages and prompt."""
+    boxes = [[round(v, 2) for v in box] for box in as_bboxes(bbox)]
+    # A single region keeps the flat form, so earlier single-box jobs still resume
+    payload = json.dumps(
+        [document_hash, boxes[0] if len(boxes) == 1 else boxes, list(page_numbers), prompt_template,
+         active_model_name()],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+class JobStore:
+    """SQLite store of jobs (one per document run) and their section tasks."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or JOB_CONFIG["path"])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                job_key TEXT UNIQUE NOT NULL,
+                document TEXT,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                job_id INTEGER NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+                idx INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                state TEXT NOT NULL,
+                result TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated);
+        """)
+        self._conn.commit()
+
+    def open_job(self, job_key, document=None):
+        """Return the job for job_key, creating it if this run is new."""
+        now = time.time()
+        with self._lock:
+            self._prune(now - JOB_CONFIG["retention_days"] * 86400)
+            self._conn.execute(
+                "INSERT INTO jobs (job_key, document, status, created, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (job_key) DO UPDATE SET updated = excluded.updated",
+                (job_key, document, PENDING, now, now)
+            )
+            self._conn.commit()
+            job_id = self._conn.execute("SELECT id FROM jobs WHERE job_key = ?", (job_key,)).fetchone()[0]
+        return Job(self, job_id)
+
+    def _prune(self, cutoff):
+        """Drop jobs, and their tasks, that nobody has opened or finished since cutoff."""
+        stale = self._conn.execute("SELECT id FROM jobs WHERE updated < ?", (cutoff,)).fetchall()
+        if not stale:
+            return
+        # Foreign keys are off by default in SQLite, so the cascade is done here
+        self._conn.executemany("DELETE FROM tasks WHERE job_id = ?", stale)
+        self._conn.executemany("DELETE FROM jobs WHERE id = ?", stale)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+        return rows
+
+class Job:
+    """Handle for checkpointing the section tasks of one job."""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def counts(self):
+        """Return the number of tasks in each state."""
+        rows = self.store._execute(
+            "SELECT state, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY state", (self.job_id,)
+        )
+        return dict(rows)
+
+    def start_task(self, idx, title, content):
+        """Register a section and return its checkpointed result if it already completed."""
+        content_hash = _content_hash(content)
+        rows = self.store._execute(
+            "SELECT content_hash, state, result FROM tasks WHERE job_id = ? AND idx = ?",
+            (self.job_id, idx)
+        )
+        if rows and rows[0][0] == content_hash and rows[0][1] == DONE:
+            return json.loads(rows[0][2])
+        self.store._execute(
+            "INSERT OR REPLACE INTO tasks (job_id, idx, title, content_hash, state, result, updated) "
+            "VALUES (?, ?, ?, ?, ?, NULL, ?)",
+            (self.job_id, idx, title, content_hash, PENDING, time.time())
+        )
+        return None
+
+    def finish_task(self, idx, result, failed=False):
+        """Checkpoint a section result as soon as it arrives."""
+        self.store._execute(
+            "UPDATE tasks SET state = ?, result = ?, updated = ? WHERE job_id = ? AND idx = ?",
+            (FAILED if failed else DONE, json.dumps(result, ensure_ascii=False), time.time(), self.job_id, idx)
+        )
+
+    def finish(self):
+        """Mark the job done once every task completed, otherwise leave it resumable."""
+        counts = self.counts()
+        status = DONE if counts and set(counts) == {DONE} else PENDING
+        self.store._execute(
+            "UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), self.job_id)
+        )
+        return status
+
+_job_store = None
+
+def get_job_store():
+    """Return the process-wide job store, creating it on first use."""
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore()
+    return _job_store
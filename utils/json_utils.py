@@ -0,0 +1,112 @@
+"""Incremental JSON recovery for streamed model output."""
+import json
+import re
+from typing import NamedTuple
+
+# Only these characters can change the scanner state; everything else is skipped in bulk
+_STRUCTURAL_CHARS = re.compile(r'[{}"\\]')
+
+class StreamingJSONParser:
+    """Scan model output chunk by chunk and emit each top-level JSON object once it closes.
+
+    Brackets, code fences and prose around the objects are ignored, so a bare
+    object, an array of objects or a fenced block all yield the same objects.
+    Every character is visited once and each closed object is parsed once.
+    """
+
+    def __init__(self):
+        self.objects = []
+        self.failed = 0
+        self.consumed_chars = 0
+        self.recovered_chars = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape_pending = False
+        self._parts = []
+
+    @property
+    def pending(self):
+        """True while an object has been opened but not yet closed."""
+        return self._depth > 0
+
+    def feed(self, text):
+        """Consume a chunk of output and return the objects it completed."""
+        new_objects = []
+        self.consumed_chars += len(text)
+        start = 0 if self._depth else None
+        escaped_pos = 0 if self._escape_pending else -1
+        self._escape_pending = False
+
+        for match in _STRUCTURAL_CHARS.finditer(text):
+            pos = match.start()
+            char = match.group()
+
+            if self._in_string:
+                if pos == escaped_pos:
+                    continue
+                if char == '\\':
+                    escaped_pos = pos + 1
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                # Quotes only matter inside an object; prose around the JSON is not parsed
+                if self._depth:
+                    self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    start = pos
+                self._depth += 1
+            elif char == '}' and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(text[start:pos + 1])
+                    candidate = "".join(self._parts)
+                    self._parts = []
+                    start = None
+                    obj = self._parse(candidate)
+                    if obj is not None:
+                        new_objects.append(obj)
+                        self.recovered_chars += len(candidate)
+
+        if self._depth and start is not None:
+            self._parts.append(text[start:])
+        if self._in_string and escaped_pos == len(text):
+            self._escape_pending = True
+
+        self.objects.extend(new_objects)
+        return new_objects
+
+    def _parse(self, candidate):
+        # strict=False accepts raw newlines inside strings, which the model often emits
+        try:
+            return json.loads(candidate, strict=False)
+        except ValueError:
+            self.failed += 1
+            return None
+
+class RecoveryReport(NamedTuple):
+    """Objects recovered from a model response and how much of it they cover."""
+    objects: list
+    failed: int
+    truncated: bool
+    recovered_chars: int
+    total_chars: int
+
+    @property
+    def coverage(self):
+        """Fraction of the response that ended up inside a recovered object."""
+        return self.recovered_chars / self.total_chars if self.total_chars else 0.0
+
+def recover_json_objects(text):
+    """Recover every top-level JSON object from model output in a single linear pass."""
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    return RecoveryReport(
+        objects=parser.objects,
+        failed=parser.failed,
+        truncated=parser.pending,
+        recovered_chars=parser.recovered_chars,
+        total_chars=parser.consumed_chars
+    )
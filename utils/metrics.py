@@ -0,0 +1,143 @@
+"""Lightweight per-run timing and resource instrumentation."""
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from config import METRICS_CONFIG
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def current_rss_mb():
+    """Current resident set size of this process in MB, or None where unsupported."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+class RunMetrics:
+    """Spans, counters and observed values collected during one pipeline run.
+
+    Memory is reported as the change in resident set size over the run and
+    the process-wide peak; on a shared server the peak covers every session,
+    and concurrent runs also move the change.
+    """
+
+    def __init__(self, document=None):
+        self.document = document
+        self.started = time.time()
+        self.wall_seconds = None
+        self.rss_start_mb = current_rss_mb()
+        self.rss_delta_mb = None
+        self.process_peak_rss_mb = None
+        self.spans = {}
+        self.counters = {}
+        self.observations = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            calls, total, longest = self.spans.get(name, (0, 0.0, 0.0))
+            self.spans[name] = (calls + 1, total + seconds, max(longest, seconds))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            self.observations.setdefault(name, []).append(value)
+
+    def finish(self):
+        self.wall_seconds = time.time() - self.started
+        rss_end_mb = current_rss_mb()
+        if self.rss_start_mb is not None and rss_end_mb is not None:
+            self.rss_delta_mb = round(rss_end_mb - self.rss_start_mb, 1)
+        self.process_peak_rss_mb = peak_rss_mb()
+
+    def summary(self):
+        """Return a JSON-serializable view of the run."""
+        observations = {}
+        for name, values in self.observations.items():
+            ordered = sorted(values)
+            observations[name] = {
+                "count": len(ordered),
+                "mean": round(sum(ordered) / len(ordered), 4),
+                "p50": round(ordered[len(ordered) // 2], 4),
+                "max": round(ordered[-1], 4)
+            }
+        return {
+            "document": self.document,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_seconds": round(self.wall_seconds or 0, 4),
+            "rss_delta_mb": self.rss_delta_mb,
+            "process_peak_rss_mb": self.process_peak_rss_mb,
+            "spans": {
+                name: {"calls": calls, "total_seconds": round(total, 4), "max_seconds": round(longest, 4)}
+                for name, (calls, total, longest) in self.spans.items()
+            },
+            "counters": dict(self.counters),
+            "observations": observations
+        }
+
+# Context variables follow asyncio tasks and asyncio.to_thread, so concurrent sessions stay separate
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+def current_run():
+    return _current_run.get()
+
+@contextmanager
+def record_run(document=None):
+    """Collect metrics for everything executed inside the block."""
+    run = RunMetrics(document)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        run.finish()
+        _current_run.reset(token)
+        export_run(run)
+
+@contextmanager
+def span(name):
+    """Time a block and add it to the current run, if one is being recorded."""
+    run = _current_run.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if run is not None:
+            run.add_span(name, time.perf_counter() - start)
+
+def count(name, n=1):
+    run = _current_run.get()
+    if run is not None:
+        run.count(name, n)
+
+def observe(name, value):
+    run = _current_run.get()
+    if run is not None:
+        run.observe(name, value)
+
+def export_run(run):
+    """Append the run summary as one JSON line when an export path is configured."""
+    path = METRICS_CONFIG["export_path"]
+    if not path:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run.summary(), ensure_ascii=False) + "\n")
@@ -1,50 +1,63 @@
 """PDF processing utilities."""
 import streamlit as st
-import pdfplumber
-import tempfile
-import os
+import hashlib
+import uuid
+from .document_store import get_document_store
+from .text_index import iter_page_texts
 
-@st.cache_resource
 def load_pdf(pdf_file):
-    """Load a PDF file with pdfplumber and cache the result."""
+    """Load a PDF through the shared document store.
+    
+    Every session uploading the same bytes gets the same on-disk copy and
+    pdfplumber handle; switching documents releases the previous one.
+    """
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(pdf_file.getvalue())
-            tmp_file_path = tmp_file.name
+        digest = get_document_hash(pdf_file)
+        session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+        store = get_document_store()
         
-        if 'temp_files' not in st.session_state:
-            st.session_state.temp_files = []
-        st.session_state.temp_files.append(tmp_file_path)
+        previous = st.session_state.get('document_digest')
+        if previous and previous != digest:
+            store.release(previous, session_id)
         
-        return pdfplumber.open(tmp_file_path)
+        document = store.acquire(digest, pdf_file.getvalue, session_id)
+        st.session_state['document_digest'] = digest
+        return document.pdf
     except Exception as e:
         st.error(f"Failed to load PDF: {str(e)}")
         return None
 
+def get_document_hash(pdf_file):
+    """Return the SHA-256 of an uploaded PDF, computed once per upload."""
+    hashes = st.session_state.setdefault('pdf_hashes', {})
+    # file_id is new for every upload, so a corrected file with the same name and size is hashed again
+    key = pdf_file.file_id
+    if key not in hashes:
+        hashes[key] = hashlib.sha256(pdf_file.getvalue()).hexdigest()
+    return hashes[key]
+
 def cleanup_temp_files():
-    """Clean up temporary files when the session ends."""
-    if 'temp_files' in st.session_state:
-        for temp_file in st.session_state.temp_files:
-            try:
-                os.remove(temp_file)
-            except Exception:
-                pass
-        st.session_state.temp_files = []
+    """Release this session's document so the store can evict it."""
+    digest = st.session_state.pop('document_digest', None)
+    if digest and 'session_id' in st.session_state:
+        get_document_store().release(digest, st.session_state.session_id)
+
+def report_page_errors(errors):
+    """Show a single warning summarizing every page that failed to extract."""
+    if not errors:
+        return
+    pages = ", ".join(str(page_number + 1) for page_number, _ in errors)
+    st.warning(f"Could not extract text from {len(errors)} page(s): {pages}")
+    with st.expander("Extraction errors"):
+        for page_number, error in errors:
+            st.text(f"Page {page_number + 1}: {error}")
 
 def extract_text_from_pdf(pdf, scaled_bbox, selected_page=None):
     """Extract text from PDF within the scaled bounding box."""
-    all_text = []
     pages_to_process = [selected_page] if selected_page is not None else range(len(pdf.pages))
-    
-    for page_number in pages_to_process:
-        try:
-            page = pdf.pages[page_number]
-            text = page.within_bbox(scaled_bbox).extract_text()
-            if text.strip():
-                all_text.append(f"{text}")
-        except Exception as e:
-            st.warning(f"Error extracting text from page {page_number + 1}: {str(e)}")
-            continue
+    errors = []
+    all_text = [text for _, text in iter_page_texts(pdf, scaled_bbox, pages_to_process, errors)]
+    report_page_errors(errors)
     
     return "\n\n".join(all_text) if all_text else ""
 
@@ -0,0 +1,59 @@
+"""Streaming pipeline from page extraction to AI structuring."""
+from typing import NamedTuple
+from .metrics import count, span
+from .records import ObservationSet
+from .sections import iter_sections
+from .text_index import iter_page_texts
+
+class PipelineResult(NamedTuple):
+    """Everything a pipeline run produced, for rendering and fallbacks."""
+    text: str
+    sections: list
+    sections_with_data: ObservationSet
+    errors: list
+
+    @property
+    def complete(self):
+        """Whether every section reached the model and came back structured."""
+        if self.sections and not self.sections_with_data:
+            return False
+        return not self.sections_with_data.failed
+
+async def run_extraction_pipeline(pdf, scaled_bbox, page_numbers, process_sections):
+    """Extract pages lazily, split them into sections and structure each one as it closes.
+
+    The first section reaches the model once the page that closes it is
+    extracted, instead of after the whole document has been read.
+    process_sections is a coroutine function taking the section stream, e.g.
+    the Streamlit flow or structure_sections bound to a model.
+    """
+    page_texts = []
+    sections = []
+    errors = []
+
+    def page_stream():
+        pages = iter_page_texts(pdf, scaled_bbox, page_numbers, errors)
+        while True:
+            with span("extract_page"):
+                page = next(pages, None)
+            if page is None:
+                break
+            count("pages_with_text")
+            page_texts.append(page[1])
+            yield page
+
+    def section_stream():
+        for section in iter_sections(page_stream()):
+            sections.append(section)
+            yield section
+
+    stream = section_stream()
+    sections_with_data = await process_sections(stream)
+
+    # The model stage stops early when it cannot start; finish extraction for the fallbacks
+    for _ in stream:
+        pass
+
+    count("pages_processed", len(page_numbers))
+    count("sections", len(sections))
+    return PipelineResult("\n\n".join(page_texts), sections, sections_with_data, errors)
@@ -0,0 +1,52 @@
+"""Prompt templates sent to the model; {text} receives the section content."""
+DEFAULT_PROMPT = """Eres un experto analizando documentos de auditoría.
+Te voy proporcionar un documento que contiene observaciones y sus respuestas a un informe técnico.
+
+Quiero que estructures el contenido de las observaciones y respuestas en un formato JSON.
+Reglas:
+- El texto debe ser transcrito, no debe ser interpretado, resumido o parafraseado.
+
+Algunas de las observaciones que te voy a dar poseen literales, otras no.
+
+Para las observaciones sin literales usa la siguiente estructura:
+Retorna los resultados así:
+[
+    {{
+        "Numero_de_observacion": "número exacto",
+        "Descripcion": "descripción principal",
+        "Informacion_Complementaria": "información adicional o null",
+        "Respuesta": "respuesta encontrada o null",
+        "Estado": "Absuelta|No Absuelta|Invalidada"
+    }},
+    // más objetos si hay más observaciones
+]
+
+Si el texto contiene literales usa la siguiente estructura:
+
+Retorna los resultados así:
+[
+    {{
+        "Numero_de_observacion": "número exacto",
+        "Descripcion": "descripción de la observación“,
+        "Informacion_Complementaria": "información adicional o null",
+	“Literal” : “letra del literal”
+        "Respuesta": "respuesta del literal encontrada o null",
+        "Estado": "Absuelta|No Absuelta|Invalidada"
+    }},
+    // más objetos si hay literales
+]
+
+Texto a analizar: {text}
+
+Instrucciones:
+1. Identifica cada observación en el texto
+2. Para cada observación:
+   - Extrae el número exacto (ej: "1.1", "2.3")
+   - Identifica la descripción principal del problema
+   - Busca información complementaria que sustente la observación
+   - Identifica si hay una respuesta o descargo
+   - Determina el estado basado en el contexto
+
+Si solo hay una observación, retorna un único objeto JSON sin lista.
+Retorna SOLO el JSON o array de JSONs, sin texto adicional.
+"""
@@ -0,0 +1,164 @@
+"""Typed observation records with their source sections stored once per result set."""
+import json
+import re
+
+_OBSERVATION_NUMBER = re.compile(r"\d+(?:\.+\d+)+")
+
+# States the prompt asks for; other values are kept as given and flagged, and only shown in the default colour
+ESTADOS = ("Absuelta", "No Absuelta", "Invalidada")
+DEFAULT_ESTADO = "No Absuelta"
+_ESTADOS = {estado.casefold(): estado for estado in ESTADOS}
+
+def observation_number(value):
+    """Normalize an observation number such as '1..2.' or 'Observación 1.2' to '1.2'."""
+    match = _OBSERVATION_NUMBER.search(str(value or ""))
+    return ".".join(re.findall(r"\d+", match.group(0))) if match else None
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip() or None
+    # Models occasionally nest values; keep them readable instead of dropping them
+    if isinstance(value, (int, float, bool)):
+        return str(value)
+    return json.dumps(value, ensure_ascii=False)
+
+class Observation:
+    """One structured observation, validated once when the model output is read.
+
+    The section text is not copied into the record; section_id points at the
+    source section held by the ObservationSet.
+    """
+
+    __slots__ = (
+        "section_id", "title", "numero", "descripcion", "informacion_complementaria",
+        "literal", "respuesta", "estado", "failed"
+    )
+
+    def __init__(self, section_id, title, numero, descripcion=None, informacion_complementaria=None,
+                 literal=None, respuesta=None, estado=DEFAULT_ESTADO, failed=False):
+        self.section_id = section_id
+        self.title = title
+        self.numero = numero
+        self.descripcion = descripcion
+        self.informacion_complementaria = informacion_complementaria
+        self.literal = literal
+        self.respuesta = respuesta
+        self.estado = estado
+        self.failed = failed
+
+    @classmethod
+    def from_dict(cls, obj, section_id, title, section_title, failed=False):
+        """Validate one object from the model, filling gaps from the section it came from."""
+        if not isinstance(obj, dict):
+            obj = {"Descripcion": obj}
+        numero = _text(obj.get("Numero_de_observacion")) or observation_number(section_title) or section_title
+        estado = _text(obj.get("Estado"))
+        estado = _ESTADOS.get(estado.casefold(), estado) if estado else None
+        return cls(
+            section_id,
+            title,
+            numero,
+            _text(obj.get("Descripcion")),
+            _text(obj.get("Informacion_Complementaria")),
+            _text(obj.get("Literal")),
+            _text(obj.get("Respuesta")),
+            estado,
+            failed
+        )
+
+    @property
+    def estado_valid(self):
+        """False when the model gave no Estado or one the prompt does not allow."""
+        return self.estado in ESTADOS
+
+    def to_dict(self):
+        """The record in the shape the prompt asks the model for."""
+        data = {
+            "Numero_de_observacion": self.numero,
+            "Descripcion": self.descripcion,
+            "Informacion_Complementaria": self.informacion_complementaria,
+            "Respuesta": self.respuesta,
+            "Estado": self.estado
+        }
+        if self.literal is not None:
+            data["Literal"] = self.literal
+        return data
+
+    def __repr__(self):
+        return f"Observation({self.title!r}, {self.numero!r}, literal={self.literal!r}, estado={self.estado!r})"
+
+class ObservationSet:
+    """Observations of one run, in section order, with each source section stored once."""
+
+    __slots__ = ("sections", "observations")
+
+    def __init__(self):
+        self.sections = []
+        self.observations = []
+
+    def add(self, section, objects, failed=False):
+        """Record a section and the objects structured from it; returns the section id."""
+        section_id = len(self.sections)
+        self.sections.append(section)
+        title = section[0]
+        for i, obj in enumerate(objects if isinstance(objects, list) else [objects], 1):
+            self.observations.append(Observation.from_dict(obj, section_id, f"{title}.{i}", title, failed))
+        return section_id
+
+    def __iter__(self):
+        return iter(self.observations)
+
+    def __len__(self):
+        return len(self.observations)
+
+    def section(self, observation):
+        """The source section of an observation."""
+        return self.sections[observation.section_id]
+
+    def content(self, observation):
+        """The text of the section an observation came from."""
+        return self.sections[observation.section_id][1]
+
+    def pages(self, observation):
+        """1-based page span of an observation's section, when the section knows its pages."""
+        return getattr(self.sections[observation.section_id], "pages", None)
+
+    def by_section(self):
+        """Yield (section, observations) pairs in section order, including sections with none."""
+        groups = [[] for _ in self.sections]
+        for observation in self.observations:
+            groups[observation.section_id].append(observation)
+        return zip(self.sections, groups)
+
+    @property
+    def failed(self):
+        return sum(observation.failed for observation in self.observations)
+
+    def rows(self):
+        """Yield one export row dict per observation."""
+        for observation in self.observations:
+            yield {
+                "Numero_de_observacion": observation.numero,
+                "Descripcion": observation.descripcion,
+                "Informacion_Complementaria": observation.informacion_complementaria,
+                "Literal": observation.literal,
+                "Respuesta": observation.respuesta,
+                "Estado": observation.estado,
+                "Paginas": self.pages(observation)
+            }
+
+    def columns(self):
+        """Export columns as lists for columnar writers, without building a dict per row."""
+        pages = [getattr(section, "pages", None) for section in self.sections]
+        observations = self.observations
+        return {
+            "Numero_de_observacion": [o.numero for o in observations],
+            "Descripcion": [o.descripcion for o in observations],
+            "Informacion_Complementaria": [o.informacion_complementaria for o in observations],
+            "Literal": [o.literal for o in observations],
+            "Respuesta": [o.respuesta for o in observations],
+            "Estado": [o.estado for o in observations],
+            "Paginas": [pages[o.section_id] for o in observations]
+        }
@@ -0,0 +1,113 @@
+"""Named extraction regions and region templates reused across documents with the same layout."""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import NamedTuple
+from config import CANVAS_CONFIG, REGION_CONFIG
+
+class Region(NamedTuple):
+    """A named extraction box, in fractions of the page width and height."""
+    name: str
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+    def to_pdf(self, width, height):
+        """The box in PDF points for a page of the given size."""
+        return (self.x0 * width, self.y0 * height, self.x1 * width, self.y1 * height)
+
+def regions_from_canvas(objects, canvas_dims, names=()):
+    """Turn the rectangles drawn on the canvas into regions, in drawing order.
+
+    Regions take the given names in order; the rest are numbered.
+    """
+    width, height = canvas_dims
+    regions = []
+    for obj in objects:
+        if obj.get("type") != "rect":
+            continue
+        x0, y0 = obj["left"], obj["top"]
+        x1 = x0 + obj["width"] * obj.get("scaleX", 1)
+        y1 = y0 + obj["height"] * obj.get("scaleY", 1)
+        name = names[len(regions)] if len(regions) < len(names) else f"Region {len(regions) + 1}"
+        regions.append(Region(name, x0 / width, y0 / height, x1 / width, y1 / height))
+    return regions
+
+def regions_to_canvas(regions, canvas_dims):
+    """Fabric.js drawing that shows regions as rectangles on a canvas of the given size."""
+    width, height = canvas_dims
+    return {
+        "version": "4.4.0",
+        "objects": [
+            {
+                "type": "rect",
+                "left": region.x0 * width,
+                "top": region.y0 * height,
+                "width": (region.x1 - region.x0) * width,
+                "height": (region.y1 - region.y0) * height,
+                "fill": CANVAS_CONFIG["fill_color"],
+                "stroke": CANVAS_CONFIG["stroke_color"],
+                "strokeWidth": CANVAS_CONFIG["stroke_width"]
+            }
+            for region in regions
+        ]
+    }
+
+class RegionTemplates:
+    """Region sets saved under a layout name in a JSON file.
+
+    Boxes are stored as page fractions, so a template drawn on one report
+    applies to every report of the same series whatever its page size.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or REGION_CONFIG["templates_path"])
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, templates):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a crash never leaves a half-written file behind
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(templates, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def names(self):
+        return sorted(self._load())
+
+    def get(self, name):
+        """Regions of a template, or None if there is no template with that name."""
+        template = self._load().get(name)
+        if template is None:
+            return None
+        return [Region(*region) for region in template["regions"]]
+
+    def save(self, name, regions, page_size=None):
+        with self._lock:
+            templates = self._load()
+            templates[name] = {"page_size": page_size and list(page_size), "regions": [list(r) for r in regions]}
+            self._write(templates)
+
+    def delete(self, name):
+        with self._lock:
+            templates = self._load()
+            if templates.pop(name, None) is not None:
+                self._write(templates)
+
+_templates = None
+
+def get_region_templates():
+    """Return the process-wide template store."""
+    global _templates
+    if _templates is None:
+        _templates = RegionTemplates()
+    return _templates
@@ -0,0 +1,162 @@
+"""Consolidated register of observations across every processed document."""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from config import REGISTER_CONFIG
+from .export_utils import EXPORT_COLUMNS, iter_rows
+from .records import observation_number
+
+# Register exports carry the source document in front of the observation columns
+REGISTER_COLUMNS = ["Documento", *EXPORT_COLUMNS]
+
+_FIELDS = {
+    "Documento": "document",
+    "Numero_de_observacion": "numero",
+    "Descripcion": "descripcion",
+    "Informacion_Complementaria": "informacion_complementaria",
+    "Literal": "literal",
+    "Respuesta": "respuesta",
+    "Estado": "estado",
+    "Paginas": "paginas"
+}
+
+class ObservationRegister:
+    """SQLite table of observation rows from all documents, indexed for filtering.
+
+    Rows are keyed by document hash and observation number: processing a
+    document again, or another page of it, replaces only the observations
+    that came back, so the register fills up page by page or run by run.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or REGISTER_CONFIG["path"])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS observations (
+                document_hash TEXT NOT NULL,
+                document TEXT,
+                numero TEXT NOT NULL,
+                descripcion TEXT,
+                informacion_complementaria TEXT,
+                literal TEXT,
+                respuesta TEXT,
+                estado TEXT,
+                paginas TEXT,
+                added REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS observations_numero ON observations (numero);
+            CREATE INDEX IF NOT EXISTS observations_estado ON observations (estado);
+            CREATE INDEX IF NOT EXISTS observations_document ON observations (document_hash, numero);
+        """)
+        self._conn.commit()
+
+    def add_document(self, document_hash, document, observations):
+        """Record the ObservationSet of one run and return the number of rows written."""
+        # Failed sections are left out so they never replace a good earlier result
+        rows = [
+            row for observation, row in zip(observations, iter_rows(observations))
+            if not observation.failed
+        ]
+        for row in rows:
+            number = row["Numero_de_observacion"]
+            row["Numero_de_observacion"] = observation_number(number) or number
+        numbers = sorted({row["Numero_de_observacion"] for row in rows})
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM observations WHERE document_hash = ? AND numero = ?",
+                [(document_hash, number) for number in numbers]
+            )
+            self._conn.executemany(
+                "INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        document_hash, document, row["Numero_de_observacion"],
+                        *(_text(row[column]) for column in EXPORT_COLUMNS[1:]), now
+                    )
+                    for row in rows
+                ]
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def query(self, numero=None, estados=None, document_hash=None, limit=None):
+        """Yield rows matching the filters as dicts keyed by REGISTER_COLUMNS.
+
+        numero matches an observation number or its sub-numbers ("2" matches
+        "2.1"); estados is a list of states to keep.
+        """
+        sql, params = self._where(numero, estados, document_hash)
+        sql = f"SELECT {', '.join(_FIELDS.values())} FROM observations{sql} ORDER BY document, added, rowid"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        # A separate reader streams rows while exporting instead of loading them up front
+        with closing(sqlite3.connect(self.path)) as conn:
+            for row in conn.execute(sql, params):
+                yield dict(zip(_FIELDS, row))
+
+    def count(self, numero=None, estados=None, document_hash=None):
+        sql, params = self._where(numero, estados, document_hash)
+        return self._execute(f"SELECT COUNT(*) FROM observations{sql}", params)[0][0]
+
+    def counts_by_estado(self):
+        """Number of rows in each state."""
+        return dict(self._execute("SELECT estado, COUNT(*) FROM observations GROUP BY estado ORDER BY estado"))
+
+    def documents(self):
+        """(document_hash, document, rows) for every document in the register, by name."""
+        return self._execute(
+            "SELECT document_hash, document, COUNT(*) FROM observations GROUP BY document_hash ORDER BY document"
+        )
+
+    def version(self):
+        """Changes whenever rows are added or replaced, for keying exports of a query."""
+        return tuple(self._execute("SELECT COUNT(*), MAX(added) FROM observations")[0])
+
+    def remove_document(self, document_hash):
+        self._execute("DELETE FROM observations WHERE document_hash = ?", (document_hash,))
+
+    def _where(self, numero, estados, document_hash):
+        clauses = []
+        params = []
+        # Match stored numbers however the filter is typed, e.g. "2.1." or "Observación 2.1"
+        numero = observation_number(numero) or (numero or "").strip().rstrip(".")
+        if numero:
+            # Two range-friendly conditions keep the numero index usable
+            clauses.append("(numero = ? OR (numero >= ? AND numero < ?))")
+            params.extend([numero, f"{numero}.", f"{numero}/"])
+        if estados:
+            clauses.append(f"estado IN ({', '.join('?' * len(estados))})")
+            params.extend(estados)
+        if document_hash:
+            clauses.append("document_hash = ?")
+            params.append(document_hash)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+        return rows
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+_register = None
+
+def get_observation_register():
+    """Return the process-wide register, or None when it is disabled."""
+    global _register
+    if not REGISTER_CONFIG["enabled"]:
+        return None
+    if _register is None:
+        _register = ObservationRegister()
+    return _register
@@ -0,0 +1,94 @@
+"""Splitting extracted page text into observation sections, independent of the Streamlit UI."""
+import re
+from typing import NamedTuple, Optional
+from config import PATTERNS
+
+SECTION_PATTERN = re.compile(PATTERNS["observation"], re.MULTILINE)
+
+# How far back into the previous page a header may start when it straddles a page break
+_HEADER_OVERLAP = 64
+
+class Section(NamedTuple):
+    """An observation and where it lies in the extracted pages.
+
+    Pages are zero-based and offsets index into that page's extracted text;
+    end_offset is exclusive. Pages are None for text that did not come from
+    a page stream.
+    """
+    title: str
+    content: str
+    start_page: Optional[int]
+    end_page: Optional[int]
+    start_offset: int
+    end_offset: int
+
+    @property
+    def pages(self):
+        """1-based page span such as "3" or "3-4", or None when the pages are unknown."""
+        if self.start_page is None:
+            return None
+        if self.start_page == self.end_page:
+            return str(self.start_page + 1)
+        return f"{self.start_page + 1}-{self.end_page + 1}"
+
+def _locate(segments, position):
+    # segments holds (buffer position, page number) for every page still in the buffer
+    for start, page_number in reversed(segments):
+        if start <= position:
+            return page_number, position - start
+    start, page_number = segments[0]
+    return page_number, position - start
+
+def _make_section(buffer, segments, title, start, end):
+    content = buffer[start:end].rstrip()
+    start_page, start_offset = _locate(segments, start)
+    end_page, last_offset = _locate(segments, start + len(content) - 1)
+    return Section(title, content, start_page, end_page, start_offset, last_offset + 1)
+
+def iter_sections(pages):
+    """Split a stream of (page_number, text) pairs into sections as the pages arrive.
+
+    Headers are found in a single pass with the configured pattern. A section
+    is yielded as soon as the next header shows up, so observations that
+    continue onto later pages are held until they close. Pages are joined
+    with blank lines, giving the same sections as splitting the joined text.
+    """
+    buffer = ""
+    segments = []
+    open_title = None
+    header_end = 0
+    for i, (page_number, text) in enumerate(pages):
+        scan_from = max(header_end, len(buffer) - _HEADER_OVERLAP)
+        if i:
+            buffer += "\n\n"
+        segments.append((len(buffer), page_number))
+        buffer += text
+        
+        matches = list(SECTION_PATTERN.finditer(buffer, scan_from))
+        if matches:
+            bounds = [(match.start(), match.group("title")) for match in matches]
+            if open_title is not None:
+                bounds.insert(0, (0, open_title))
+            for (start, title), (end, _) in zip(bounds, bounds[1:]):
+                yield _make_section(buffer, segments, title, start, end)
+            # Keep only the still-open section, which now begins at offset 0
+            last = matches[-1]
+            cut = last.start()
+            open_title = last.group("title")
+            header_end = last.end() - cut
+        elif open_title is None:
+            # Text before the first header is never part of a section; keep just enough for a split header
+            cut = max(0, len(buffer) - _HEADER_OVERLAP)
+        else:
+            continue
+        
+        buffer = buffer[cut:]
+        segments = [(start - cut, n) for start, n in segments]
+        while len(segments) > 1 and segments[1][0] <= 0:
+            segments.pop(0)
+    
+    if open_title is not None:
+        yield _make_section(buffer, segments, open_title, 0, len(buffer))
+
+def split_text_into_sections(text):
+    return list(iter_sections([(None, text)]))
@@ -0,0 +1,31 @@
+"""Per-session memoization of results that depend on user input."""
+from collections import OrderedDict
+import streamlit as st
+from config import SESSION_CONFIG
+
+def _memo(name):
+    memo = st.session_state.get(name)
+    if memo is None:
+        memo = st.session_state[name] = OrderedDict()
+    return memo
+
+def get_memoized(name, key):
+    """Return the value memoized under key in this session, or None."""
+    memo = _memo(name)
+    value = memo.get(key)
+    if value is not None:
+        memo.move_to_end(key)
+    return value
+
+def drop_memoized(name, key):
+    """Forget the value memoized under key in this session, if any."""
+    _memo(name).pop(key, None)
+
+def set_memoized(name, key, value):
+    """Memoize a value for this session, dropping the least recently used beyond the limit."""
+    memo = _memo(name)
+    memo[key] = value
+    memo.move_to_end(key)
+    while len(memo) > SESSION_CONFIG["max_results"]:
+        memo.popitem(last=False)
+    return value
@@ -0,0 +1,407 @@
+"""Spatial character index for fast bounding-box text extraction."""
+import hashlib
+import math
+import multiprocessing
+import os
+import threading
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+from pdfplumber.page import Page
+from config import PDF_CONFIG
+
+# Same defaults pdfplumber uses for extract_text
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+class PageIndex:
+    """Characters of one page sorted by top edge in compact parallel arrays.
+
+    A rectangle query bisects the sorted tops to the rows inside the box and
+    only filters those characters, instead of re-filtering every char object
+    on the page the way within_bbox does. The arrays take a small fraction
+    of the memory of pdfplumber's char dicts.
+    """
+
+    __slots__ = ("page_number", "width", "height", "texts", "x0", "x1", "top", "bottom")
+
+    def __init__(self, page_number, width, height, chars):
+        chars = sorted(chars, key=lambda c: (c["top"], c["x0"]))
+        self.page_number = page_number
+        self.width = width
+        self.height = height
+        self.texts = [c["text"] for c in chars]
+        self.x0 = array("d", (c["x0"] for c in chars))
+        self.x1 = array("d", (c["x1"] for c in chars))
+        self.top = array("d", (c["top"] for c in chars))
+        self.bottom = array("d", (c["bottom"] for c in chars))
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the index (single-character strings are shared)."""
+        coordinates = sum(a.itemsize * len(a) for a in (self.x0, self.x1, self.top, self.bottom))
+        return coordinates + 8 * len(self.texts)
+
+    def query(self, bbox):
+        """Return indices of chars lying entirely inside bbox, ordered by top."""
+        bx0, by0, bx1, by1 = bbox
+        lo = bisect_left(self.top, by0)
+        hi = bisect_right(self.top, by1)
+        x0, x1, bottom = self.x0, self.x1, self.bottom
+        return [
+            i for i in range(lo, hi)
+            if x0[i] >= bx0 and x1[i] <= bx1 and bottom[i] <= by1
+        ]
+
+    def extract_text(self, bbox):
+        """Rebuild the text inside bbox the way pdfplumber's default extract_text does."""
+        return self.text_for(self.query(bbox))
+
+    def extract_regions(self, bboxes):
+        """Text inside each bbox, gathered in a single pass over the rows the boxes span."""
+        if len(bboxes) == 1:
+            return [self.extract_text(bboxes[0])]
+        lo = bisect_left(self.top, min(bbox[1] for bbox in bboxes))
+        hi = bisect_right(self.top, max(bbox[3] for bbox in bboxes))
+        x0, x1, top, bottom = self.x0, self.x1, self.top, self.bottom
+        hits = [[] for _ in bboxes]
+        for i in range(lo, hi):
+            for region, (bx0, by0, bx1, by1) in zip(hits, bboxes):
+                if top[i] >= by0 and bottom[i] <= by1 and x0[i] >= bx0 and x1[i] <= bx1:
+                    region.append(i)
+        return [self.text_for(indices) for indices in hits]
+
+    def text_for(self, indices):
+        """Group the given char indices into words and lines and join them."""
+        lines = []
+        line = []
+        last_top = None
+        for i in indices:
+            if last_top is not None and self.top[i] > last_top + Y_TOLERANCE:
+                lines.append(self._line_text(line))
+                line = []
+            line.append(i)
+            last_top = self.top[i]
+        if line:
+            lines.append(self._line_text(line))
+        # Lines holding only spaces yield no words, and pdfplumber leaves them out
+        return "\n".join(text for text in lines if text)
+
+    def _line_text(self, line):
+        line.sort(key=self.x0.__getitem__)
+        words = []
+        word = []
+        prev_x1 = None
+        for i in line:
+            text = self.texts[i]
+            if text.isspace():
+                if word:
+                    words.append("".join(word))
+                    word = []
+                prev_x1 = None
+                continue
+            if word and prev_x1 is not None and self.x0[i] > prev_x1 + X_TOLERANCE:
+                words.append("".join(word))
+                word = []
+            word.append(text)
+            prev_x1 = self.x1[i]
+        if word:
+            words.append("".join(word))
+        return " ".join(words)
+
+def as_bboxes(bboxes):
+    """Accept a single (x0, top, x1, bottom) box or a sequence of them; return a list of boxes."""
+    if len(bboxes) == 4 and all(isinstance(v, (int, float)) for v in bboxes):
+        return [tuple(bboxes)]
+    return [tuple(bbox) for bbox in bboxes]
+
+def build_page_index(page, page_number):
+    """Index the characters of a pdfplumber page."""
+    return PageIndex(page_number, page.width, page.height, page.chars)
+
+class LazyPages(Sequence):
+    """Page list that creates each pdfplumber Page on first access.
+
+    The count comes from the page tree root, and the tree is only walked as
+    far as the highest page requested, so opening a long annex does not build
+    a Page object for every page up front.
+    """
+
+    def __init__(self, pdf):
+        self._pdf = pdf
+        self._page_objects = PDFPage.create_pages(pdf.doc)
+        self._resolved = []
+        self._pages = {}
+        self._count = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        if self._count is None:
+            try:
+                self._count = int(resolve1(resolve1(self._pdf.doc.catalog["Pages"])["Count"]))
+            except Exception:
+                # Damaged or missing page tree: count by walking it, as pdfminer would
+                with self._lock:
+                    self._resolved.extend(self._page_objects)
+                    self._count = len(self._resolved)
+        return self._count
+
+    def __getitem__(self, page_number):
+        if isinstance(page_number, slice):
+            return [self[n] for n in range(*page_number.indices(len(self)))]
+        if page_number < 0:
+            page_number += len(self)
+        with self._lock:
+            page = self._pages.get(page_number)
+            if page is None:
+                while len(self._resolved) <= page_number:
+                    obj = next(self._page_objects, None)
+                    if obj is None:
+                        raise IndexError(page_number)
+                    self._resolved.append(obj)
+                # doctop offsets would need every earlier page; nothing here reads them
+                page = self._pages[page_number] = Page(
+                    self._pdf, self._resolved[page_number], page_number=page_number + 1, initial_doctop=0
+                )
+            return page
+
+    def created(self):
+        """The pages built so far."""
+        with self._lock:
+            return list(self._pages.values())
+
+class LazyPDF(pdfplumber.PDF):
+    """pdfplumber PDF whose pages are created on demand; open it with LazyPDF.open(path)."""
+
+    @property
+    def pages(self):
+        pages = self.__dict__.get("_lazy_pages")
+        if pages is None:
+            pages = self.__dict__["_lazy_pages"] = LazyPages(self)
+        return pages
+
+    def close(self):
+        # pdfplumber's close walks self.pages, which would create every page just to close it
+        pages = self.__dict__.get("_lazy_pages")
+        for page in pages.created() if pages is not None else ():
+            page.close()
+        self.flush_cache()
+        if not self.stream_is_external:
+            self.stream.close()
+
+def release_page(page):
+    """Drop the layout objects pdfplumber cached while parsing a page."""
+    close = getattr(page, "close", None)
+    if close is not None:
+        close()
+    else:
+        page.flush_cache()
+
+@contextmanager
+def open_page(pdf, page_number):
+    """Yield a page for exclusive use and flush its parsed objects afterwards.
+
+    pdfplumber keeps every parsed char, line and rect on the Page object for
+    the life of the handle; flushing after each use keeps only our compact
+    index and rendered images around.
+    """
+    with pdf_lock(pdf):
+        page = pdf.pages[page_number]
+        try:
+            yield page
+        finally:
+            release_page(page)
+
+class PageIndexCache:
+    """Page indices of one document, least recently used evicted beyond a byte budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, page_number):
+        return page_number in self._pages
+
+    def get(self, page_number):
+        with self._lock:
+            index = self._pages.get(page_number)
+            if index is not None:
+                self._pages.move_to_end(page_number)
+            return index
+
+    def put(self, page_number, index):
+        with self._lock:
+            previous = self._pages.pop(page_number, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._pages[page_number] = index
+            self.nbytes += index.nbytes
+            # Evicted pages are simply rebuilt on their next query
+            while self.nbytes > self.max_bytes and len(self._pages) > 1:
+                _, evicted = self._pages.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+# Per-document page indices; entries disappear with the pdfplumber handle
+_indices = weakref.WeakKeyDictionary()
+
+def _index_cache(pdf):
+    with _pdf_locks_guard:
+        cache = _indices.get(pdf)
+        if cache is None:
+            cache = _indices[pdf] = PageIndexCache(PDF_CONFIG["index_budget_mb"] * 1024 * 1024)
+        return cache
+
+def get_page_index(pdf, page_number):
+    """Return the index for a page, building it on first use."""
+    pages = _index_cache(pdf)
+    index = pages.get(page_number)
+    if index is None:
+        with open_page(pdf, page_number) as page:
+            index = build_page_index(page, page_number)
+        pages.put(page_number, index)
+    return index
+
+def get_pdf_path(pdf):
+    """Return the on-disk path a pdfplumber handle was opened from, if any."""
+    path = getattr(pdf, "path", None) or getattr(pdf.stream, "name", None)
+    return str(path) if path and os.path.exists(path) else None
+
+_document_hashes = weakref.WeakKeyDictionary()
+
+def document_hash(pdf):
+    """SHA-256 of the file behind a pdfplumber handle, computed once per handle."""
+    digest = _document_hashes.get(pdf)
+    if digest is None:
+        path = get_pdf_path(pdf)
+        if path is None:
+            # In-memory handles have no stable identity beyond the object itself
+            digest = f"id-{id(pdf)}"
+        else:
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+        _document_hashes[pdf] = digest
+    return digest
+
+def register_document_hash(pdf, digest):
+    """Record a digest already known to the caller, skipping the file hash."""
+    _document_hashes[pdf] = digest
+
+# pdfplumber handles share one file stream, so parsing and rendering on a handle must be serialized
+_pdf_locks = weakref.WeakKeyDictionary()
+_pdf_locks_guard = threading.Lock()
+
+def pdf_lock(pdf):
+    """Return the lock guarding a pdfplumber handle."""
+    with _pdf_locks_guard:
+        lock = _pdf_locks.get(pdf)
+        if lock is None:
+            lock = _pdf_locks[pdf] = threading.RLock()
+        return lock
+
+def index_page_range(pdf_path, page_numbers):
+    """Open the PDF in a worker process and index the given pages.
+
+    Returns (page_number, index, error) tuples so one bad page does not
+    discard the rest of the range.
+    """
+    results = []
+    with pdfplumber.open(pdf_path, pages=[n + 1 for n in page_numbers]) as pdf:
+        for page_number, page in zip(page_numbers, pdf.pages):
+            try:
+                results.append((page_number, build_page_index(page, page_number), None))
+            except Exception as e:
+                results.append((page_number, None, str(e)))
+            finally:
+                release_page(page)
+    return results
+
+def _chunk_pages(page_numbers, workers):
+    # Several small chunks per worker keep cores busy and let early pages stream back sooner
+    size = max(1, math.ceil(len(page_numbers) / (workers * 4)))
+    return [page_numbers[i:i + size] for i in range(0, len(page_numbers), size)]
+
+def iter_page_indices(pdf, page_numbers, max_workers=None):
+    """Yield (page_number, index, error) in page order.
+
+    Pages already indexed are served from memory. When enough pages are
+    missing, they are split into ranges and indexed by a pool of worker
+    processes, each opening the PDF from its own path.
+    """
+    pages = _index_cache(pdf)
+    page_numbers = list(page_numbers)
+    missing = [n for n in page_numbers if n not in pages]
+    pdf_path = get_pdf_path(pdf)
+    workers = max_workers or PDF_CONFIG["extraction_workers"] or os.cpu_count() or 1
+
+    if pdf_path is None or workers < 2 or len(missing) < PDF_CONFIG["parallel_min_pages"]:
+        for page_number in page_numbers:
+            try:
+                yield page_number, get_page_index(pdf, page_number), None
+            except Exception as e:
+                yield page_number, None, str(e)
+        return
+
+    # spawn keeps workers clear of the Streamlit server's threads and state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {}
+        chunks = {}
+        for chunk in _chunk_pages(missing, workers):
+            future = executor.submit(index_page_range, pdf_path, chunk)
+            chunks[future] = chunk
+            for page_number in chunk:
+                futures[page_number] = future
+
+        # Finished chunks are held only until their pages are yielded, whatever the budget evicts
+        built = {}
+        for page_number in page_numbers:
+            future = futures.get(page_number)
+            if future is None:
+                try:
+                    yield page_number, get_page_index(pdf, page_number), None
+                except Exception as e:
+                    yield page_number, None, str(e)
+                continue
+            if page_number not in built:
+                try:
+                    results = future.result()
+                except Exception as e:
+                    # A worker that dies (e.g. out of memory) breaks the pool; its pages become page errors
+                    results = [(done_number, None, f"Indexing worker failed: {e!r}") for done_number in chunks[future]]
+                for done_number, index, error in results:
+                    built[done_number] = (index, error)
+                    if error is None:
+                        pages.put(done_number, index)
+            index, error = built.pop(page_number)
+            yield page_number, index, error
+
+def iter_page_texts(pdf, scaled_bbox, page_numbers, errors):
+    """Yield (page_number, text) in page order, recording failed pages in errors.
+
+    scaled_bbox is one box or a list of boxes; the text of several boxes is
+    joined in the order they are given, e.g. left column then right column.
+    """
+    bboxes = as_bboxes(scaled_bbox)
+    for page_number, index, error in iter_page_indices(pdf, page_numbers):
+        if error is None:
+            try:
+                text = "\n".join(t for t in index.extract_regions(bboxes) if t)
+            except Exception as e:
+                error = str(e)
+        if error is not None:
+            errors.append((page_number, error))
+            continue
+        if text.strip():
+            yield page_number, text
@@ -0,0 +1,150 @@
+"""Rate limiting, retries and adaptive concurrency around a generative model."""
+import random
+import threading
+import time
+from config import AI_CONFIG
+
+# HTTP status codes worth retrying; google.api_core exceptions expose them as `code`
+THROTTLED_STATUS = 429
+RETRYABLE_STATUS = {THROTTLED_STATUS, 500, 502, 503, 504}
+
+def error_status(error):
+    """Return the HTTP status carried by an API error, if any."""
+    code = getattr(error, "code", None)
+    return int(code) if isinstance(code, int) else None
+
+def is_retryable(error):
+    return error_status(error) in RETRYABLE_STATUS
+
+class TokenBucket:
+    """Allow `rate` requests per second on average with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on throttling and grows by one per window of successes."""
+
+    def __init__(self, initial, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = initial
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_throttle(self):
+        with self._condition:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._successes = 0
+
+class ResilientModel:
+    """Wrap a model's generate_content with a rate limiter, retries and adaptive concurrency.
+
+    Any object with a GenerativeModel-style generate_content works, so a local
+    fake that raises errors carrying a 429/5xx `code` exercises the same paths.
+    A stream is only retried if it failed before yielding its first chunk;
+    replaying a half-consumed stream would duplicate output downstream.
+    """
+
+    def __init__(self, model, requests_per_minute=None, burst=None, max_retries=None,
+                 backoff_base=None, backoff_max=None, min_concurrency=None, max_concurrency=None):
+        self.model = model
+        self.model_name = getattr(model, "model_name", None)
+        self.max_retries = max_retries if max_retries is not None else AI_CONFIG["max_retries"]
+        self.backoff_base = backoff_base or AI_CONFIG["backoff_base"]
+        self.backoff_max = backoff_max or AI_CONFIG["backoff_max"]
+        self.bucket = TokenBucket(
+            (requests_per_minute or AI_CONFIG["requests_per_minute"]) / 60,
+            burst or AI_CONFIG["burst"]
+        )
+        maximum = max_concurrency or AI_CONFIG["max_concurrency"]
+        self.limiter = AdaptiveLimiter(maximum, min_concurrency or AI_CONFIG["min_concurrency"], maximum)
+        self.retries = 0
+        self.throttled = 0
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retrying workers from hitting the quota in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        if stream:
+            return self._stream(prompt, generation_config)
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self.limiter.acquire()
+            try:
+                response = self.model.generate_content(prompt, generation_config=generation_config)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            else:
+                self.limiter.on_success()
+                return response
+            finally:
+                self.limiter.release()
+            time.sleep(self._backoff(attempt))
+
+    def _stream(self, prompt, generation_config):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self.limiter.acquire()
+            emitted = False
+            try:
+                for chunk in self.model.generate_content(prompt, generation_config=generation_config, stream=True):
+                    emitted = True
+                    yield chunk
+            except Exception as e:
+                if emitted or not self._should_retry(e, attempt):
+                    raise
+            else:
+                self.limiter.on_success()
+                return
+            finally:
+                self.limiter.release()
+            time.sleep(self._backoff(attempt))
+
+    def _should_retry(self, error, attempt):
+        if error_status(error) == THROTTLED_STATUS:
+            self.throttled += 1
+            self.limiter.on_throttle()
+        if attempt >= self.max_retries or not is_retryable(error):
+            return False
+        self.retries += 1
+        return True